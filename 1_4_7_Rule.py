@@ -1,68 +1,153 @@
 import streamlit as st
-import json
+import csv
+import io
 import os
-from datetime import datetime
+from datetime import datetime, time
+from topic_store import open_store
 
-# File to store topics
+# Where topics are stored: "sqlite" (TOPICS_DB) or "json" (the old TOPICS_FILE format)
+TOPICS_BACKEND = os.environ.get('TOPICS_BACKEND', 'sqlite')
+TOPICS_DB = 'topics.db'
+# Legacy file; imported into the SQLite store on first run
 TOPICS_FILE = 'topics.json'
 
 # Stages in order
 STAGES = ['day1', 'day4', 'day7', 'memory']
 NEXT_STAGE = {'day1': 'day4', 'day4': 'day7', 'day7': 'memory'}
+PAGE_SIZE = 50  # topics per table page
 
-def load_topics():
-    if os.path.exists(TOPICS_FILE):
-        with open(TOPICS_FILE, 'r') as f:
-            data = json.load(f)
-            # Convert created_at back to datetime if needed, but for simplicity, keep as string
-            return data
-    return []
+@st.cache_resource
+def get_store():
+    """One store per process, shared by every tab."""
+    if TOPICS_BACKEND == 'json':
+        return open_store('json', TOPICS_FILE)
+    return open_store('sqlite', TOPICS_DB, legacy_json=TOPICS_FILE)
 
-def save_topics(topics):
-    with open(TOPICS_FILE, 'w') as f:
-        json.dump(topics, f, indent=4)
+def stage_label(stage):
+    return stage.replace('day', 'Day ')
+
+def parse_topic_csv(data):
+    """Topic names from CSV bytes: the "name" column if there is a header, else the first column."""
+    rows = [row for row in csv.reader(io.StringIO(data.decode('utf-8-sig'))) if row]
+    if not rows:
+        return []
+    header = [cell.strip().lower() for cell in rows[0]]
+    column = header.index('name') if 'name' in header else 0
+    if 'name' in header:
+        rows = rows[1:]
+    return [row[column].strip() for row in rows if len(row) > column and row[column].strip()]
+
+def data_version():
+    """Bumped after every bulk write; part of the table and uploader keys."""
+    return st.session_state.get('topics_version', 0)
+
+def bump_data_version():
+    """Give the tables and the uploader new keys, so a selection or upload from before a write is dropped."""
+    st.session_state['topics_version'] = data_version() + 1
+
+def review_selected(store, topics):
+    """Move every selected topic to its next stage in one write."""
+    store.set_stages([(t['id'], NEXT_STAGE[t['stage']]) for t in topics], datetime.now().isoformat())
+    bump_data_version()
+
+def topic_table(store, key, count, fetch, columns, query="", reviewable=True):
+    """One page of topics as a selectable table, with a bulk review button.
+
+    Streamlit keeps a keyed table's row selection when its rows change, so the
+    key includes the page, the filter and the data version: selected row
+    indices never carry over to different topics.
+    """
+    pages = max(1, -(-count // PAGE_SIZE))
+    page = st.number_input("Page", min_value=1, max_value=pages, value=1, key=f"page_{key}") if pages > 1 else 1
+    topics = fetch((page - 1) * PAGE_SIZE, PAGE_SIZE)
+    st.caption(f"Showing {len(topics)} of {count} topics (page {page} of {pages})")
+    event = st.dataframe(
+        [{label: column(t) for label, column in columns.items()} for t in topics],
+        hide_index=True,
+        on_select="rerun" if reviewable else "ignore",
+        selection_mode="multi-row",
+        key=f"table_{key}_{page}_{query}_{data_version()}",
+    )
+    if not reviewable:
+        return
+    selected = [topics[i] for i in event.selection.rows if i < len(topics)]
+    if st.button(f"Mark {len(selected)} Reviewed", key=f"review_{key}", disabled=not selected):
+        review_selected(store, selected)
+        st.rerun()
 
 def main():
     st.title("1-4-7 Rule Study App")
 
-    # Load topics
-    if 'topics' not in st.session_state:
-        st.session_state.topics = load_topics()
+    store = get_store()
 
     # Add new topic
     st.header("Add New Topic")
     new_topic = st.text_input("Enter topic name:")
     if st.button("Add Topic"):
         if new_topic.strip():
-            topic = {
-                'name': new_topic.strip(),
-                'stage': 'day1',
-                'created_at': datetime.now().isoformat(),
-                'last_reviewed': datetime.now().isoformat()
-            }
-            st.session_state.topics.append(topic)
-            save_topics(st.session_state.topics)
+            store.add(new_topic.strip(), 'day1', datetime.now().isoformat())
             st.success(f"Added topic: {new_topic}")
             st.rerun()  # Refresh to clear input
 
+    with st.expander("Import topics from CSV"):
+        uploaded = st.file_uploader(
+            "CSV with a \"name\" column (or one topic per line)",
+            type=['csv', 'txt'],
+            key=f"topic_csv_{data_version()}",
+        )
+        if uploaded is not None:
+            names = parse_topic_csv(uploaded.getvalue())
+            if st.button(f"Import {len(names)} Topics", disabled=not names):
+                added = store.add_many(names, 'day1', datetime.now().isoformat())
+                st.session_state['import_message'] = f"Imported {added} topics"
+                bump_data_version()  # also clears the uploader, so a second click cannot import again
+                st.rerun()
+        if 'import_message' in st.session_state:
+            st.success(st.session_state.pop('import_message'))
+
+    query = st.text_input("🔎 Filter topics by name", key="topic_filter").strip()
+
+    # Topics due by the end of today, earliest (most overdue) first
+    st.header("📅 Due Today")
+    today = datetime.now().date()
+    until = datetime.combine(today, time.max).isoformat()
+    due_count = store.count_due(until, query)
+    if not due_count:
+        st.write("Nothing to review today.")
+    else:
+        topic_table(
+            store,
+            "due",
+            due_count,
+            lambda offset, limit: store.due(until, query, offset, limit),
+            {
+                "Topic": lambda t: t['name'],
+                "Stage": lambda t: stage_label(t['stage']),
+                "Due": lambda t: t['due_at'][:10] + (" (overdue)" if t['due_at'][:10] < today.isoformat() else ""),
+            },
+            query=query,
+        )
+
     # Display topics by stage
     for stage in STAGES:
-        st.header(f"Stage: {stage.replace('day', 'Day ')}")
-        stage_topics = [t for t in st.session_state.topics if t['stage'] == stage]
-        if not stage_topics:
+        count = store.count_stage(stage, query)
+        st.header(f"Stage: {stage_label(stage)} ({count})")
+        if not count:
             st.write("No topics in this stage.")
         else:
-            for i, topic in enumerate(stage_topics):
-                col1, col2 = st.columns([3, 1])
-                with col1:
-                    st.write(f"**{topic['name']}** (Created: {topic['created_at'][:10]})")
-                with col2:
-                    if stage != 'memory':
-                        if st.button(f"Mark Reviewed", key=f"{stage}_{i}"):
-                            topic['stage'] = NEXT_STAGE[stage]
-                            topic['last_reviewed'] = datetime.now().isoformat()
-                            save_topics(st.session_state.topics)
-                            st.rerun()
+            topic_table(
+                store,
+                stage,
+                count,
+                lambda offset, limit, stage=stage: store.by_stage(stage, query, offset, limit),
+                {
+                    "Topic": lambda t: t['name'],
+                    "Created": lambda t: t['created_at'][:10],
+                    "Due": lambda t: (t['due_at'] or "")[:10],
+                },
+                query=query,
+                reviewable=stage != 'memory',
+            )
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,6 +1,19 @@
 import streamlit as st
+import os
+import re
 from collections import Counter, defaultdict
 import pandas as pd
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from bpe import BPEEncoder, BPETrainer, DEFAULT_CHUNK_SIZE, MODEL_MAGIC, load_model, save_model, stream_vocab
+
+# Saved models are only read from and written to this directory.
+MODELS_DIR = os.environ.get("BPE_MODELS_DIR", "bpe_models")
+# "Files on server" only offers files under this directory.
+CORPUS_DIR = os.environ.get("BPE_CORPUS_DIR", "corpus")
+# Large run mode keeps the top pairs of about this many evenly spaced steps.
+TOP_PAIRS_SNAPSHOTS = 1000
 
 # ---------------- BPE FUNCTIONS ----------------
 def get_vocab(text):
@@ -22,47 +35,308 @@ def get_stats(vocab):
 
 def merge_vocab(pair, vocab):
     """Merge the most frequent pair."""
-    bigram = " ".join(pair)
+    # Only match whole symbols, so merging ("e", "s") leaves "e st" untouched.
+    bigram = re.compile(r"(?<!\S)" + re.escape(" ".join(pair)) + r"(?!\S)")
     replacement = "".join(pair)
     new_vocab = {}
     for word in vocab:
-        new_word = word.replace(bigram, replacement)
+        new_word = bigram.sub(replacement, word)
         new_vocab[new_word] = vocab[word]
     return new_vocab
 
+def best_pair(pairs):
+    """Most frequent pair, ties broken by the smallest pair (same rule as BPETrainer)."""
+    return min(pairs, key=lambda p: (-pairs[p], p))
+
+def resolve_inside(directory, name):
+    """Real path of `name` inside `directory`; ValueError if it is absolute, uses '..' or escapes it."""
+    parts = name.replace("\\", "/").split("/")
+    if not name.strip() or os.path.isabs(name) or ".." in parts:
+        raise ValueError(f"Use a relative name inside {directory}/ without '..'.")
+    root = os.path.realpath(directory)
+    path = os.path.realpath(os.path.join(root, name))
+    if path == root or os.path.commonpath([root, path]) != root:
+        raise ValueError(f"{name} is outside {directory}/.")
+    return path
+
+def corpus_files(directory):
+    """Relative paths of the regular files under `directory`, skipping hidden files and folders."""
+    files = []
+    for dirpath, dirnames, filenames in os.walk(directory):
+        dirnames[:] = [d for d in dirnames if not d.startswith(".")]
+        files.extend(os.path.relpath(os.path.join(dirpath, name), directory) for name in filenames if not name.startswith("."))
+    return sorted(files)
+
+def is_model_file(path):
+    """True if `path` starts with the magic bytes `save_model` writes."""
+    with open(path, "rb") as f:
+        return f.read(len(MODEL_MAGIC)) == MODEL_MAGIC
+
+@st.cache_resource
+def load_cached_model(path, mtime):
+    """Memory-map a saved model once per process; `mtime` invalidates stale entries."""
+    return load_model(path)
+
 # ---------------- STREAMLIT UI ----------------
 st.set_page_config(page_title="BPE Demo", page_icon="🔡", layout="centered")
 st.title("🔡 Byte Pair Encoding (BPE) Demonstration")
 st.write("This demo shows how Byte Pair Encoding (BPE) works step by step.")
 
+with st.sidebar:
+    st.header("⚙️ Performance")
+    workers = st.number_input(
+        "Worker processes",
+        min_value=1,
+        max_value=os.cpu_count() or 1,
+        value=1,
+        help="Processes used for the first word-counting and pair-counting passes.",
+    )
+
+    st.header("💾 Saved Model")
+    model_name = st.text_input("Model file", "bpe_model.bin", help=f"Stored in {MODELS_DIR}/ on the server.")
+    try:
+        model_path = resolve_inside(MODELS_DIR, model_name)
+    except ValueError as e:
+        st.error(str(e))
+        model_path = None
+    if model_path and st.button("Load model"):
+        if os.path.isfile(model_path):
+            try:
+                st.session_state["bpe_encoder"] = load_cached_model(model_path, os.path.getmtime(model_path))
+                st.success(f"Loaded {model_name}")
+            except ValueError as e:
+                st.error(str(e))
+        else:
+            st.error(f"File not found: {model_name}")
+    if model_path and "bpe_encoder" in st.session_state and st.button("Save model"):
+        if os.path.isdir(model_path) or (os.path.exists(model_path) and not is_model_file(model_path)):
+            st.error(f"{model_name} exists and is not a BPE model file; not overwriting it.")
+        else:
+            os.makedirs(os.path.dirname(model_path), exist_ok=True)
+            save_model(st.session_state["bpe_encoder"], model_path)
+            st.success(f"Saved to {model_name} ({os.path.getsize(model_path):,} bytes)")
+
 # Input text
-user_text = st.text_area("Enter your text:", "low lower newest widest")
-num_merges = st.slider("Number of merges", min_value=1, max_value=20, value=10)
+source = st.radio("Corpus source", ["Text box", "Files on server"], horizontal=True)
+if source == "Text box":
+    user_text = st.text_area("Enter your text:", "low lower newest widest")
+else:
+    corpus_names = st.multiselect(
+        "Corpus files",
+        corpus_files(CORPUS_DIR),
+        help=f"Files in {CORPUS_DIR}/ on the server. They are streamed in chunks, so they can be larger than memory.",
+    )
+    chunk_size = st.number_input("Chunk size (characters)", min_value=1024, value=DEFAULT_CHUNK_SIZE, step=1024)
+large_run = st.checkbox(
+    "Large run mode",
+    value=source != "Text box",
+    help="Records a compact summary per merge instead of rendering every pair table and vocabulary.",
+)
+if large_run:
+    num_merges = st.number_input("Number of merges", min_value=1, max_value=1_000_000, value=1000)
+    top_k = st.number_input(
+        "Top pairs recorded per step",
+        min_value=1,
+        max_value=100,
+        value=10,
+        help=f"Kept for up to {TOP_PAIRS_SNAPSHOTS:,} evenly spaced steps, so long runs stay small.",
+    )
+else:
+    num_merges = st.slider("Number of merges", min_value=1, max_value=20, value=10)
+use_incremental = st.checkbox(
+    "Use incremental trainer",
+    value=source != "Text box" or large_run,
+    disabled=source != "Text box" or large_run,
+    help="Updates pair counts only for the words touched by each merge instead of rescanning the vocabulary.",
+)
 
 if st.button("Run BPE"):
     st.subheader("Step-by-step BPE Process")
 
-    vocab = get_vocab(user_text)
-    st.markdown("### Initial Vocabulary")
-    st.json(vocab)
+    if source == "Text box":
+        vocab = get_vocab(user_text)
+        symbols = None
+        st.markdown("### Initial Vocabulary")
+        if large_run:
+            st.write(f"{len(vocab):,} unique words, {sum(vocab.values()):,} total")
+        else:
+            st.json(vocab)
+    else:
+        if not corpus_names:
+            st.error(f"Please select at least one file from {CORPUS_DIR}/.")
+            st.stop()
+        try:
+            paths = [resolve_inside(CORPUS_DIR, name) for name in corpus_names]
+        except ValueError as e:
+            st.error(str(e))
+            st.stop()
+        missing = [name for name, path in zip(corpus_names, paths) if not os.path.isfile(path)]
+        if missing:
+            st.error(f"File not found: {', '.join(missing)}")
+            st.stop()
+        with st.spinner("Streaming corpus..."):
+            vocab, symbols = stream_vocab(paths, chunk_size=int(chunk_size), workers=workers)
+        st.markdown("### Initial Vocabulary")
+        st.write(f"{len(vocab):,} unique words, {sum(vocab.values()):,} total, {len(symbols):,} symbols")
 
-    for i in range(num_merges):
-        pairs = get_stats(vocab)
-        if not pairs:
-            break
-        best = max(pairs, key=pairs.get)
-        freq_table = pd.DataFrame(pairs.items(), columns=["Pair", "Frequency"]).sort_values(by="Frequency", ascending=False)
+    st.session_state.pop("bpe_run", None)
+    if large_run:
+        trainer = BPETrainer(vocab, symbols, workers=workers)
+        ids = trainer.symbols.ids
+        # Compact columns of symbol ids and counts; names are looked up when shown.
+        history = {"left": array("I"), "right": array("I"), "frequency": array("Q"), "vocab_size": array("I")}
+        top = {"step": array("I"), "left": array("I"), "right": array("I"), "frequency": array("Q")}
+        top_stride = max(1, -(-int(num_merges) // TOP_PAIRS_SNAPSHOTS))
+        progress = st.progress(0.0, text="Training...")
+        for i in range(int(num_merges)):
+            if i % top_stride == 0:
+                pairs = trainer.top_pairs(int(top_k))
+                if not pairs:
+                    break
+                for (a, b), freq in pairs:
+                    top["step"].append(i)
+                    top["left"].append(ids[a])
+                    top["right"].append(ids[b])
+                    top["frequency"].append(freq)
+                best, freq = pairs[0]
+                trainer.merge(best)
+            else:
+                step = trainer.step()
+                if step is None:
+                    break
+                best, freq = step
+            history["left"].append(ids[best[0]])
+            history["right"].append(ids[best[1]])
+            history["frequency"].append(freq)
+            history["vocab_size"].append(len(trainer.symbols))
+            if (i + 1) % 100 == 0:
+                progress.progress((i + 1) / num_merges, text=f"Training... {i + 1:,} merges")
+        progress.progress(1.0, text=f"Done: {len(history['frequency']):,} merges")
+        # Keep the results only; the trainer's heap and pair index go away with it.
+        final_vocab = pd.DataFrame(trainer.vocab.items(), columns=["Word", "Frequency"])
+        st.session_state["bpe_run"] = {
+            "history": history,
+            "top": top,
+            "top_stride": top_stride,
+            "names": list(trainer.symbols.names),
+            "vocab": final_vocab.sort_values("Frequency", ascending=False, kind="stable", ignore_index=True),
+            "tokens": len(trainer.tokens()),
+        }
+        tokens = None
+        encoder = BPEEncoder.from_trainer(trainer)
+    elif use_incremental:
+        trainer = BPETrainer(vocab, symbols, workers=workers)
+        for i in range(num_merges):
+            step = trainer.step()
+            if step is None:
+                break
+            best, freq = step
+            st.markdown(f"### Step {i+1}")
+            st.write(f"**Merging Pair:** `{best}` → `{''.join(best)}` (frequency {freq})")
+        if source == "Text box":
+            st.write("Updated Vocabulary:")
+            st.json(trainer.vocab)
+        tokens = trainer.tokens()
+        encoder = BPEEncoder.from_trainer(trainer)
+    else:
+        base_symbols = sorted({symbol for word in vocab for symbol in word.split()})
+        merges = []
+        for i in range(num_merges):
+            pairs = get_stats(vocab)
+            if not pairs:
+                break
+            best = best_pair(pairs)
+            freq_table = pd.DataFrame(pairs.items(), columns=["Pair", "Frequency"]).sort_values(by="Frequency", ascending=False)
 
-        st.markdown(f"### Step {i+1}")
-        st.write(f"**Merging Pair:** `{best}` → `{''.join(best)}`")
-        st.dataframe(freq_table)
+            st.markdown(f"### Step {i+1}")
+            st.write(f"**Merging Pair:** `{best}` → `{''.join(best)}`")
+            st.dataframe(freq_table)
 
-        vocab = merge_vocab(best, vocab)
-        st.write("Updated Vocabulary:")
-        st.json(vocab)
+            vocab = merge_vocab(best, vocab)
+            merges.append(best)
+            st.write("Updated Vocabulary:")
+            st.json(vocab)
 
-    st.subheader("✅ Final Subword Vocabulary")
-    tokens = set()
-    for word in vocab:
-        tokens.update(word.split())
-    st.write(tokens)
+        tokens = set()
+        for word in vocab:
+            tokens.update(word.split())
+        encoder = BPEEncoder(merges, base_symbols)
+
+    st.session_state["bpe_encoder"] = encoder
+    if tokens is not None:
+        st.subheader("✅ Final Subword Vocabulary")
+        st.write(tokens)
+
+# ---------------- LARGE RUN HISTORY ----------------
+if "bpe_run" in st.session_state:
+    run = st.session_state["bpe_run"]
+    history, top, names = run["history"], run["top"], run["names"]
+    steps = len(history["frequency"])
+    st.subheader("📈 Merge History")
+    if steps:
+        stride = max(1, steps // 1000)
+        st.line_chart(pd.DataFrame({
+            "step": range(1, steps + 1, stride),
+            "frequency": history["frequency"][::stride].tolist(),
+        }).set_index("step"))
+
+        step = st.slider("Step", min_value=1, max_value=steps, value=1) if steps > 1 else 1
+        i = step - 1
+        pair = (names[history["left"][i]], names[history["right"][i]])
+        st.write(
+            f"**Step {step}:** `{pair}` → `{''.join(pair)}` "
+            f"(frequency {history['frequency'][i]:,}, vocabulary size {history['vocab_size'][i]:,})"
+        )
+        recorded = i - i % run["top_stride"]
+        if recorded != i:
+            st.caption(f"Top pairs are recorded every {run['top_stride']:,} steps; showing step {recorded + 1:,}.")
+        lo, hi = bisect_left(top["step"], recorded), bisect_right(top["step"], recorded)
+        st.dataframe(pd.DataFrame({
+            "Pair": [str((names[a], names[b])) for a, b in zip(top["left"][lo:hi], top["right"][lo:hi])],
+            "Frequency": top["frequency"][lo:hi].tolist(),
+        }))
+
+        page_size = 500
+        pages = (steps + page_size - 1) // page_size
+        page = st.number_input("Merges page", min_value=1, max_value=pages, value=1) if pages > 1 else 1
+        lo, hi = (page - 1) * page_size, min(page * page_size, steps)
+        pairs = [(names[a], names[b]) for a, b in zip(history["left"][lo:hi], history["right"][lo:hi])]
+        st.dataframe(pd.DataFrame({
+            "Step": range(lo + 1, hi + 1),
+            "Pair": [str(pair) for pair in pairs],
+            "Merged": ["".join(pair) for pair in pairs],
+            "Frequency": history["frequency"][lo:hi].tolist(),
+            "Vocabulary Size": history["vocab_size"][lo:hi].tolist(),
+        }))
+
+    if st.checkbox("Show final vocabulary"):
+        rows = run["vocab"]
+        page_size = 500
+        pages = max(1, (len(rows) + page_size - 1) // page_size)
+        page = st.number_input("Vocabulary page", min_value=1, max_value=pages, value=1) if pages > 1 else 1
+        st.caption(f"{len(rows):,} words, {run['tokens']:,} subword tokens")
+        st.dataframe(rows.iloc[(page - 1) * page_size:page * page_size])
+
+# ---------------- ENCODE WITH THE LEARNED MERGES ----------------
+if "bpe_encoder" in st.session_state:
+    encoder = st.session_state["bpe_encoder"]
+    st.subheader("🔤 Encode Text")
+    st.caption(f"{len(encoder.merges):,} merges, {len(encoder.symbols):,} tokens")
+    encode_text = st.text_area("Text to encode (one document per line):", "lowest newer wider")
+    if st.button("Encode"):
+        documents = encode_text.splitlines()
+        start = time.perf_counter()
+        encoded = encoder.encode_many(documents)
+        elapsed = time.perf_counter() - start
+        total_tokens = sum(len(ids) for ids in encoded)
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Tokens", f"{total_tokens:,}")
+        col2.metric("Tokens/sec", f"{total_tokens / elapsed:,.0f}" if elapsed > 0 else "∞")
+        col3.metric("Word cache hits", f"{encoder.cache_info().hits:,}")
+        names = encoder.symbols.names
+        st.dataframe(pd.DataFrame({
+            "Document": documents[:100],
+            "Tokens": [" ".join(names[i] for i in ids) for ids in encoded[:100]],
+            "Ids": [str(ids) for ids in encoded[:100]],
+        }))
+        st.write("Decoded:", encoder.decode(encoded[0]) if encoded else "")
@@ -0,0 +1,720 @@
+"""Incremental Byte Pair Encoding trainer.
+
+`get_stats`/`merge_vocab` in Byte-Pair-Encoding-Algo.py rescan the whole
+vocabulary on every merge. `BPETrainer` keeps pair counts and a
+pair -> words index instead, so each merge only revisits the words that
+contain the chosen pair. The next pair comes from a max-heap with lazy
+deletion: stale entries are dropped or re-pushed when they reach the top.
+
+Ties are broken lexicographically (highest count first, then smallest pair),
+the same rule the reference loop in the app uses, so both produce identical
+merges.
+
+For corpora that do not fit in a text box, `read_chunks`/`count_words`
+stream files in bounded chunks and `stream_vocab` turns the word counts into
+tuples of interned symbol ids, so memory depends on the number of unique
+words rather than on corpus size.
+
+With `workers > 1` the first counting pass and the initial pair statistics
+run in a process pool: files are split into byte-range shards, each worker
+counts its shard, and the partial results are merged pairwise (a tree
+reduction) inside the pool. Run `python bpe.py --benchmark-mb 300` to see
+how the counting pass scales with the number of workers.
+
+`BPEEncoder` applies a learned merge list to new text: each word is
+segmented by repeatedly merging its lowest-rank adjacent pair, and the
+token ids of recently seen words are kept in an LRU cache.
+
+`save_model` writes an encoder to a compact binary file (string table,
+array-backed merges and an open-addressing rank table). `load_model` maps
+that file with `mmap` and reads it in place, so loading does not depend on
+the size of the merge table and processes loading the same file share its
+pages.
+"""
+import argparse
+import heapq
+import mmap
+import os
+import random
+import re
+import struct
+import sys
+import tempfile
+import time
+from array import array
+from collections import Counter, defaultdict
+from collections.abc import Sequence
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+END_OF_WORD = "</w>"
+UNKNOWN = "<unk>"
+DEFAULT_CHUNK_SIZE = 1 << 20  # characters per read
+DEFAULT_CACHE_SIZE = 65536  # words kept by BPEEncoder
+
+MODEL_MAGIC = b"BPE1"
+# magic, symbol count, merge count, string blob bytes, lookup symbol count, rank table slots
+_MODEL_HEADER = struct.Struct("<4sIIIII")
+_EMPTY_SLOT = 0xFFFFFFFF
+_HASH_MULTIPLIER = 0x9E3779B1
+
+_TRAILING_WORD = re.compile(r"\S*\Z")
+_TRAILING_WORD_BYTES = re.compile(rb"\S*\Z")
+_SPACE_BYTE = re.compile(rb"\s")
+
+
+class SymbolTable:
+    """Interns symbol strings to small integer ids and back."""
+
+    def __init__(self):
+        self.names = []
+        self.ids = {}
+
+    def intern(self, name):
+        symbol_id = self.ids.get(name)
+        if symbol_id is None:
+            symbol_id = len(self.names)
+            self.ids[name] = symbol_id
+            self.names.append(name)
+        return symbol_id
+
+    def __len__(self):
+        return len(self.names)
+
+    def encode_word(self, word):
+        """Character symbols of `word` plus the end-of-word marker, as a tuple of ids."""
+        return tuple(self.intern(ch) for ch in word) + (self.intern(END_OF_WORD),)
+
+
+def read_chunks(paths, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield text chunks from each file, never splitting a word across chunks."""
+    for path in paths:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            carry = ""
+            while True:
+                block = f.read(chunk_size)
+                if not block:
+                    break
+                block = carry + block
+                tail = _TRAILING_WORD.search(block)
+                carry = tail.group()
+                if tail.start():
+                    yield block[:tail.start()]
+            if carry:
+                yield carry
+
+
+def count_words(chunks):
+    """Pre-tokenize each chunk on whitespace and accumulate word frequencies."""
+    counts = Counter()
+    for chunk in chunks:
+        counts.update(chunk.split())
+    return counts
+
+
+def _read_to_space(f, block_size=4096):
+    """Read up to (not including) the next whitespace byte and leave the file positioned there."""
+    parts = []
+    while True:
+        block = f.read(block_size)
+        if not block:
+            break
+        space = _SPACE_BYTE.search(block)
+        if space:
+            parts.append(block[:space.start()])
+            f.seek(space.start() - len(block), os.SEEK_CUR)
+            break
+        parts.append(block)
+    return b"".join(parts)
+
+
+def read_range(path, start, end, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield text chunks for the words that start inside the byte range [start, end).
+
+    A word straddling `start` belongs to the previous range and is skipped; a
+    word straddling `end` is read to completion. Chunks are cut at ASCII
+    whitespace, which never falls inside a UTF-8 sequence.
+    """
+    with open(path, "rb") as f:
+        if start > 0:
+            f.seek(start - 1)
+            if not f.read(1).isspace():
+                _read_to_space(f)
+        pos = f.tell()
+        carry = b""
+        while pos < end:
+            block = f.read(min(chunk_size, end - pos))
+            if not block:
+                break
+            pos += len(block)
+            block = carry + block
+            tail = _TRAILING_WORD_BYTES.search(block)
+            carry = tail.group()
+            if tail.start():
+                yield block[:tail.start()].decode("utf-8", errors="replace")
+        if carry:
+            carry += _read_to_space(f)
+            yield carry.decode("utf-8", errors="replace")
+
+
+def plan_shards(paths, shards):
+    """Split the files into `shards` lists of (path, start, end) byte ranges of about equal size."""
+    sizes = [(path, os.path.getsize(path)) for path in paths]
+    total = sum(size for _, size in sizes)
+    target = max(1, -(-total // max(1, shards)))
+    plan, current, room = [], [], target
+    for path, size in sizes:
+        start = 0
+        while start < size:
+            take = min(room, size - start)
+            current.append((path, start, start + take))
+            start += take
+            room -= take
+            if room == 0:
+                plan.append(current)
+                current, room = [], target
+    if current:
+        plan.append(current)
+    return plan
+
+
+def _count_shard(segments, chunk_size):
+    counts = Counter()
+    for path, start, end in segments:
+        for chunk in read_range(path, start, end, chunk_size):
+            counts.update(chunk.split())
+    return counts
+
+
+def _merge_counts(a, b):
+    if len(a) < len(b):
+        a, b = b, a
+    a.update(b)
+    return a
+
+
+def tree_reduce(executor, parts, combine):
+    """Merge partial results pairwise in the pool until one is left."""
+    parts = list(parts)
+    if not parts:
+        return None
+    while len(parts) > 1:
+        futures = [executor.submit(combine, parts[i], parts[i + 1]) for i in range(0, len(parts) - 1, 2)]
+        leftover = [parts[-1]] if len(parts) % 2 else []
+        parts = [future.result() for future in futures] + leftover
+    return parts[0]
+
+
+def parallel_count_words(paths, workers, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Word frequencies for the files, counted by `workers` processes."""
+    if workers <= 1:
+        return count_words(read_chunks(paths, chunk_size))
+    shards = plan_shards(paths, workers)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        partials = list(executor.map(_count_shard, shards, [chunk_size] * len(shards)))
+        return tree_reduce(executor, partials, _merge_counts) or Counter()
+
+
+def _pair_stats_shard(offset, words, freqs):
+    counts = defaultdict(int)
+    index = defaultdict(list)
+    for idx, (word, freq) in enumerate(zip(words, freqs), start=offset):
+        for pair in set(zip(word, word[1:])):
+            index[pair].append(idx)
+        for pair in zip(word, word[1:]):
+            counts[pair] += freq
+    return dict(counts), dict(index)
+
+
+def _merge_pair_stats(a, b):
+    counts, index = a
+    other_counts, other_index = b
+    for pair, count in other_counts.items():
+        counts[pair] = counts.get(pair, 0) + count
+    for pair, ids in other_index.items():
+        if pair in index:
+            index[pair].extend(ids)
+        else:
+            index[pair] = ids
+    return counts, index
+
+
+def parallel_pair_stats(words, freqs, workers):
+    """Pair counts and pair -> word-index lists, computed over `workers` shards of the vocabulary."""
+    step = max(1, -(-len(words) // workers))
+    offsets = range(0, len(words), step)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        partials = list(executor.map(
+            _pair_stats_shard,
+            offsets,
+            [words[o:o + step] for o in offsets],
+            [freqs[o:o + step] for o in offsets],
+        ))
+        return tree_reduce(executor, partials, _merge_pair_stats) or ({}, {})
+
+
+def stream_vocab(paths, chunk_size=DEFAULT_CHUNK_SIZE, symbols=None, workers=1):
+    """Build an id-tuple vocabulary from files. Returns (vocab, symbols)."""
+    symbols = symbols if symbols is not None else SymbolTable()
+    counts = parallel_count_words(paths, workers, chunk_size)
+    vocab = {}
+    while counts:
+        word, freq = counts.popitem()
+        vocab[symbols.encode_word(word)] = freq
+    return vocab, symbols
+
+
+def merge_symbols(symbols, pair, new_symbol):
+    """Merge every non-overlapping occurrence of `pair` in a symbol list, left to right."""
+    a, b = pair
+    merged = []
+    i = 0
+    n = len(symbols)
+    while i < n:
+        if i < n - 1 and symbols[i] == a and symbols[i + 1] == b:
+            merged.append(new_symbol)
+            i += 2
+        else:
+            merged.append(symbols[i])
+            i += 1
+    return merged
+
+
+class BPETrainer:
+    """Learn BPE merges incrementally from a word-frequency vocabulary.
+
+    `vocab` maps words to frequencies. Words are either strings in the
+    `get_vocab` format (space-separated symbols ending in "</w>") or tuples
+    of symbol ids from `symbols`, as produced by `stream_vocab`. Internally
+    words are always id tuples; `merges` holds the learned pairs as strings.
+    With `workers > 1` the initial pair statistics are computed in a
+    process pool.
+    """
+
+    def __init__(self, vocab, symbols=None, workers=1):
+        self.symbols = symbols if symbols is not None else SymbolTable()
+        self.words = []
+        self.freqs = []
+        for word, freq in vocab.items():
+            if isinstance(word, str):
+                word = tuple(self.symbols.intern(name) for name in word.split())
+            self.words.append(word)
+            self.freqs.append(freq)
+        self.pair_counts = defaultdict(int)
+        self.pair_index = defaultdict(set)
+        if workers > 1 and len(self.words) > 1:
+            counts, index = parallel_pair_stats(self.words, self.freqs, workers)
+            self.pair_counts.update(counts)
+            for pair, ids in index.items():
+                self.pair_index[pair] = set(ids)
+        else:
+            for idx, (word, freq) in enumerate(zip(self.words, self.freqs)):
+                for pair in zip(word, word[1:]):
+                    self.pair_counts[pair] += freq
+                    self.pair_index[pair].add(idx)
+        self.heap = [self._heap_entry(pair, count) for pair, count in self.pair_counts.items()]
+        heapq.heapify(self.heap)
+        self.merges = []
+
+    def _heap_entry(self, pair, count):
+        # Symbol names sit between count and ids so ties break on the strings.
+        names = self.symbols.names
+        return (-count, names[pair[0]], names[pair[1]], pair)
+
+    def best_pair(self):
+        """Return (pair, count) for the most frequent pair, or None when nothing is left to merge."""
+        heap = self.heap
+        while heap:
+            neg_count, _, _, pair = heap[0]
+            count = self.pair_counts.get(pair, 0)
+            if count <= 0:
+                heapq.heappop(heap)
+            elif -neg_count != count:
+                # Stale entry: the count dropped since it was pushed.
+                heapq.heapreplace(heap, self._heap_entry(pair, count))
+            else:
+                return self.pair_names(pair), count
+        return None
+
+    def top_pairs(self, k):
+        """The `k` most frequent pairs as [(pair, count)], read off the heap in O(k log n)."""
+        heap = self.heap
+        found = []
+        seen = set()
+        while heap and len(found) < k:
+            entry = heapq.heappop(heap)
+            pair = entry[3]
+            count = self.pair_counts.get(pair, 0)
+            if count <= 0 or pair in seen:
+                continue
+            if -entry[0] != count:
+                heapq.heappush(heap, self._heap_entry(pair, count))
+                continue
+            seen.add(pair)
+            found.append(entry)
+        for entry in found:
+            heapq.heappush(heap, entry)
+        return [((a, b), -neg_count) for neg_count, a, b, _ in found]
+
+    def pair_names(self, pair):
+        """Translate a pair of symbol ids into a pair of strings."""
+        names = self.symbols.names
+        return names[pair[0]], names[pair[1]]
+
+    def merge(self, pair):
+        """Apply one merge, updating counts and the index for the affected words only.
+
+        `pair` is a pair of symbol strings, as returned by `best_pair`.
+        """
+        names = pair
+        pair = (self.symbols.ids[names[0]], self.symbols.ids[names[1]])
+        new_symbol = self.symbols.intern("".join(names))
+        touched = set()
+        emptied = set()
+        for idx in self.pair_index.pop(pair, ()):
+            word = self.words[idx]
+            freq = self.freqs[idx]
+            merged = tuple(merge_symbols(word, pair, new_symbol))
+            old_pairs = list(zip(word, word[1:]))
+            new_pairs = list(zip(merged, merged[1:]))
+            for p in old_pairs:
+                self.pair_counts[p] -= freq
+                emptied.add(p)
+            for p in new_pairs:
+                self.pair_counts[p] += freq
+                touched.add(p)
+            new_set = set(new_pairs)
+            for p in set(old_pairs) - new_set:
+                if p != pair:
+                    self.pair_index[p].discard(idx)
+            for p in new_set:
+                self.pair_index[p].add(idx)
+            self.words[idx] = merged
+
+        self.pair_counts.pop(pair, None)
+        for p in emptied:
+            if self.pair_counts.get(p, 0) <= 0:
+                self.pair_counts.pop(p, None)
+                self.pair_index.pop(p, None)
+        for p in touched:
+            if p not in self.pair_counts:
+                continue
+            heapq.heappush(self.heap, self._heap_entry(p, self.pair_counts[p]))
+        self.merges.append(names)
+
+    def step(self):
+        """Find and apply the next merge. Returns (pair, count) or None when done."""
+        best = self.best_pair()
+        if best is None:
+            return None
+        self.merge(best[0])
+        return best
+
+    def train(self, num_merges):
+        """Run up to `num_merges` merges and return the list of learned pairs."""
+        for _ in range(num_merges):
+            if self.step() is None:
+                break
+        return self.merges
+
+    @property
+    def vocab(self):
+        """Current vocabulary in the `get_vocab` string format."""
+        names = self.symbols.names
+        return {" ".join(names[s] for s in word): freq for word, freq in zip(self.words, self.freqs)}
+
+    def tokens(self):
+        """Set of subword symbols in the current vocabulary."""
+        ids = set()
+        for word in self.words:
+            ids.update(word)
+        return {self.symbols.names[i] for i in ids}
+
+
+class BPEEncoder:
+    """Encode text to token ids with a learned merge list, and decode it back.
+
+    `merges` is the ordered list of string pairs learned by training; a
+    pair's position is its rank. `base_symbols` adds single symbols (usually
+    the training alphabet) that never appear in a merge. Characters outside
+    the table encode to the "<unk>" token.
+    """
+
+    def __init__(self, merges, base_symbols=(), cache_size=DEFAULT_CACHE_SIZE):
+        symbols = SymbolTable()
+        symbols.intern(UNKNOWN)
+        symbols.intern(END_OF_WORD)
+        for name in base_symbols:
+            symbols.intern(name)
+        merges = [tuple(pair) for pair in merges]
+        ranks = {}
+        for rank, (a, b) in enumerate(merges):
+            pair = (symbols.intern(a), symbols.intern(b))
+            if pair not in ranks:
+                ranks[pair] = (rank, symbols.intern(a + b))
+        self._setup(symbols, merges, ranks, cache_size)
+
+    def _setup(self, symbols, merges, ranks, cache_size):
+        # `symbols` needs `names` (a sequence) and `ids` (covering at least
+        # single characters); `ranks.get((left, right))` returns (rank, merged id).
+        self.symbols = symbols
+        self.merges = merges
+        self.ranks = ranks
+        self.unknown_id = symbols.ids[UNKNOWN]
+        self.end_of_word_id = symbols.ids[END_OF_WORD]
+        self._encode_word = lru_cache(maxsize=cache_size)(self._segment)
+
+    @classmethod
+    def from_trainer(cls, trainer, cache_size=DEFAULT_CACHE_SIZE):
+        return cls(trainer.merges, trainer.symbols.names, cache_size)
+
+    def _segment(self, word):
+        ids = self.symbols.ids
+        unknown = self.unknown_id
+        tokens = [ids.get(ch, unknown) for ch in word]
+        tokens.append(self.end_of_word_id)
+        ranks = self.ranks
+        while len(tokens) > 1:
+            best = None
+            for pair in zip(tokens, tokens[1:]):
+                ranked = ranks.get(pair)
+                if ranked is not None and (best is None or ranked[0] < best[1][0]):
+                    best = (pair, ranked)
+            if best is None:
+                break
+            pair, (_, merged) = best
+            tokens = merge_symbols(tokens, pair, merged)
+        return tuple(tokens)
+
+    def encode_word(self, word):
+        """Token ids for a single whitespace-free word."""
+        return self._encode_word(word)
+
+    def encode(self, text):
+        """Token ids for `text`, split into words on whitespace."""
+        ids = []
+        for word in text.split():
+            ids.extend(self._encode_word(word))
+        return ids
+
+    def encode_many(self, texts):
+        """Encode a batch of documents, sharing the word cache across them."""
+        return [self.encode(text) for text in texts]
+
+    def decode(self, ids):
+        """Text for a list of token ids; words are joined with single spaces."""
+        names = self.symbols.names
+        return "".join(names[i] for i in ids).replace(END_OF_WORD, " ").rstrip()
+
+    def tokenize(self, text):
+        """Token strings for `text`, handy for display."""
+        names = self.symbols.names
+        return [names[i] for i in self.encode(text)]
+
+    def cache_info(self):
+        return self._encode_word.cache_info()
+
+
+def _native_array(typecode, data):
+    values = array(typecode, data)
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values
+
+
+def save_model(encoder, path):
+    """Write an encoder's symbol table, merges and rank table to a binary file.
+
+    The file is written next to `path` and renamed into place, so encoders
+    that `load_model` mapped from an older file at `path` keep reading it.
+    """
+    names = list(encoder.symbols.names)
+    ids = {name: i for i, name in enumerate(names)}
+    encoded = [name.encode("utf-8") for name in names]
+    offsets = [0]
+    for raw in encoded:
+        offsets.append(offsets[-1] + len(raw))
+    blob = b"".join(encoded)
+    # Symbols the encoder looks up by name: single characters and the two specials.
+    lookup = [i for i, name in enumerate(names) if len(name) == 1 or name in (UNKNOWN, END_OF_WORD)]
+
+    merges = []
+    for a, b in encoder.merges:
+        merges.extend((ids[a], ids[b], ids[a + b]))
+
+    slots = 8
+    while slots < 2 * len(encoder.merges):
+        slots *= 2
+    mask = slots - 1
+    table = [_EMPTY_SLOT] * (3 * slots)
+    for rank in range(len(encoder.merges)):
+        left, right = merges[3 * rank], merges[3 * rank + 1]
+        slot = ((left * _HASH_MULTIPLIER) ^ right) & mask
+        while table[3 * slot] != _EMPTY_SLOT:
+            if table[3 * slot] == left and table[3 * slot + 1] == right:
+                break
+            slot = (slot + 1) & mask
+        else:
+            table[3 * slot:3 * slot + 3] = [left, right, rank]
+
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_MODEL_HEADER.pack(MODEL_MAGIC, len(names), len(encoder.merges), len(blob), len(lookup), slots))
+            f.write(_native_array("I", offsets).tobytes())
+            f.write(_native_array("I", lookup).tobytes())
+            f.write(_native_array("I", merges).tobytes())
+            f.write(_native_array("I", table).tobytes())
+            f.write(blob)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+class _MappedNames(Sequence):
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob = blob
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return str(self.blob[self.offsets[i]:self.offsets[i + 1]], "utf-8")
+
+
+class _MappedSymbols:
+    def __init__(self, names, lookup_ids):
+        self.names = names
+        self.ids = {names[i]: i for i in lookup_ids}
+
+    def __len__(self):
+        return len(self.names)
+
+
+class _MappedMerges(Sequence):
+    def __init__(self, merges, names):
+        self.merges = merges
+        self.names = names
+
+    def __len__(self):
+        return len(self.merges) // 3
+
+    def __getitem__(self, rank):
+        if not 0 <= rank < len(self):
+            raise IndexError(rank)
+        return self.names[self.merges[3 * rank]], self.names[self.merges[3 * rank + 1]]
+
+
+class _MappedRanks:
+    """Read-only view of the open-addressing rank table stored in a model file."""
+
+    def __init__(self, table, merges):
+        self.table = table
+        self.merges = merges
+        self.mask = len(table) // 3 - 1
+
+    def get(self, pair, default=None):
+        left, right = pair
+        table = self.table
+        mask = self.mask
+        slot = ((left * _HASH_MULTIPLIER) ^ right) & mask
+        # A valid table always has an empty slot; the bound only guards a corrupt file.
+        for _ in range(mask + 1):
+            stored = table[3 * slot]
+            if stored == _EMPTY_SLOT:
+                return default
+            if stored == left and table[3 * slot + 1] == right:
+                rank = table[3 * slot + 2]
+                return rank, self.merges[3 * rank + 2]
+            slot = (slot + 1) & mask
+        return default
+
+
+def load_model(path, cache_size=DEFAULT_CACHE_SIZE):
+    """Memory-map a file written by `save_model` and return a BPEEncoder reading from it."""
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        header = f.read(_MODEL_HEADER.size)
+        if len(header) < _MODEL_HEADER.size:
+            raise ValueError("truncated or corrupt model file")
+        magic, n_symbols, n_merges, blob_size, n_lookup, slots = _MODEL_HEADER.unpack(header)
+        if magic != MODEL_MAGIC:
+            raise ValueError(f"{path} is not a BPE model file")
+        # Every section the header declares has to fit in the file.
+        expected = _MODEL_HEADER.size + 4 * (n_symbols + 1 + n_lookup + 3 * n_merges + 3 * slots) + blob_size
+        if size < expected or n_lookup > n_symbols or slots == 0 or slots & (slots - 1):
+            raise ValueError("truncated or corrupt model file")
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mapped)
+
+    def take(start, count):
+        data = view[start:start + 4 * count]
+        if sys.byteorder != "little":
+            swapped = array("I", data)
+            swapped.byteswap()
+            return swapped
+        return data.cast("I")
+
+    pos = _MODEL_HEADER.size
+    offsets = take(pos, n_symbols + 1)
+    pos += 4 * (n_symbols + 1)
+    lookup_ids = take(pos, n_lookup)
+    pos += 4 * n_lookup
+    merges = take(pos, 3 * n_merges)
+    pos += 4 * 3 * n_merges
+    table = take(pos, 3 * slots)
+    pos += 4 * 3 * slots
+    blob = view[pos:pos + blob_size]
+
+    names = _MappedNames(offsets, blob)
+    encoder = BPEEncoder.__new__(BPEEncoder)
+    try:
+        encoder._setup(_MappedSymbols(names, lookup_ids), _MappedMerges(merges, names), _MappedRanks(table, merges), cache_size)
+    except (KeyError, IndexError, UnicodeDecodeError):
+        raise ValueError("truncated or corrupt model file") from None
+    encoder._mmap = mapped
+    return encoder
+
+
+def write_synthetic_corpus(path, size_mb, vocab_size=50000, seed=0):
+    """Write roughly `size_mb` MB of Zipf-distributed random words to `path`."""
+    rng = random.Random(seed)
+    alphabet = "abcdefghijklmnopqrstuvwxyz"
+    words = ["".join(rng.choice(alphabet) for _ in range(rng.randint(2, 12))) for _ in range(vocab_size)]
+    weights = [1.0 / rank for rank in range(1, vocab_size + 1)]
+    target = size_mb * 1024 * 1024
+    written = 0
+    with open(path, "w", encoding="utf-8") as f:
+        while written < target:
+            line = " ".join(rng.choices(words, weights, k=20000)) + "\n"
+            f.write(line)
+            written += len(line)
+
+
+def benchmark(size_mb=300, max_workers=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Time the word-counting pass for 1..max_workers processes on a synthetic corpus."""
+    max_workers = max_workers or os.cpu_count() or 1
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "corpus.txt")
+        write_synthetic_corpus(path, size_mb)
+        print(f"corpus: {os.path.getsize(path) / 1024 / 1024:.0f} MB")
+        counts_to_try = sorted({1, max_workers} | {2 ** k for k in range(max_workers.bit_length()) if 2 ** k <= max_workers})
+        baseline = None
+        for workers in counts_to_try:
+            start = time.perf_counter()
+            counts = parallel_count_words([path], workers, chunk_size)
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            print(f"workers={workers:<3} {elapsed:7.2f}s  speedup x{baseline / elapsed:4.2f}  unique words={len(counts):,}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark parallel BPE word counting.")
+    parser.add_argument("--benchmark-mb", type=int, default=300, help="size of the synthetic corpus")
+    parser.add_argument("--workers", type=int, default=None, help="maximum number of worker processes")
+    args = parser.parse_args()
+    benchmark(args.benchmark_mb, args.workers)
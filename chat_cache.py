@@ -0,0 +1,130 @@
+"""Two-tier response cache for the OpenRouter chatbot.
+
+Users often ask the same question ("how do I read a CSV") with the same
+system prompt, so the answer can be reused instead of paying for another
+round trip. `ResponseCache` keys answers on a hash of the model and the
+normalized messages sent, and keeps them in:
+
+- an in-memory LRU of recent answers, and
+- a SQLite table on disk that survives restarts.
+
+Both tiers expire entries after `ttl` seconds and evict the least recently
+used entries beyond their size limits. A disk hit is copied into memory.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def normalize_messages(messages):
+    """Role and whitespace-collapsed content of each message."""
+    return [(m["role"], " ".join(m["content"].split())) for m in messages]
+
+
+def cache_key(model, messages):
+    payload = json.dumps([model, normalize_messages(messages)], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Thread-safe LRU + SQLite cache of chat answers with hit/miss counters."""
+
+    def __init__(self, path="chat_cache.sqlite3", ttl=86400.0, memory_items=256, disk_items=10000):
+        self.ttl = ttl
+        self.memory_items = memory_items
+        self.disk_items = disk_items
+        self.memory = OrderedDict()  # key -> (created, response)
+        self.lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        self.db = None
+        if path:
+            self.db = sqlite3.connect(path, check_same_thread=False)
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, model TEXT, response TEXT, created REAL, last_used REAL)"
+            )
+            self.db.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+            self.db.commit()
+
+    def get(self, model, messages):
+        """Cached answer for this request, or None."""
+        key = cache_key(model, messages)
+        now = time.time()
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None:
+                if now - entry[0] <= self.ttl:
+                    self.memory.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    return entry[1]
+                del self.memory[key]
+
+            if self.db is not None:
+                row = self.db.execute(
+                    "SELECT created, response FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    if now - row[0] <= self.ttl:
+                        self.db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+                        self.db.commit()
+                        self._remember(key, row[0], row[1])
+                        self.stats["disk_hits"] += 1
+                        return row[1]
+                    self.db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self.db.commit()
+
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, model, messages, response):
+        key = cache_key(model, messages)
+        now = time.time()
+        with self.lock:
+            self._remember(key, now, response)
+            if self.db is not None:
+                self.db.execute(
+                    "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                    (key, model, response, now, now),
+                )
+                self._evict_disk(now)
+                self.db.commit()
+
+    def _remember(self, key, created, response):
+        self.memory[key] = (created, response)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_items:
+            self.memory.popitem(last=False)
+
+    def _evict_disk(self, now):
+        """Drop expired rows, then the least recently used rows over the limit."""
+        self.db.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+        self.db.execute(
+            "DELETE FROM responses WHERE key IN ("
+            "SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (self.disk_items,),
+        )
+
+    def clear(self):
+        with self.lock:
+            self.memory.clear()
+            if self.db is not None:
+                self.db.execute("DELETE FROM responses")
+                self.db.commit()
+            for name in self.stats:
+                self.stats[name] = 0
+
+    def info(self):
+        """Counters and tier sizes for display."""
+        with self.lock:
+            disk = self.db.execute("SELECT COUNT(*) FROM responses").fetchone()[0] if self.db is not None else 0
+            hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+            lookups = hits + self.stats["misses"]
+            return {
+                **self.stats,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "memory_entries": len(self.memory),
+                "disk_entries": disk,
+            }
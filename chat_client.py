@@ -0,0 +1,232 @@
+"""Shared, pooled OpenAI-compatible client for the OpenRouter chatbot.
+
+openrouter-api-use.py used to build a new `OpenAI(...)` on every message,
+paying for a new connection pool and TLS handshake each turn. `ChatClient`
+is meant to be created once per process (the app caches it with
+`st.cache_resource`):
+
+- one client, so its keep-alive connection pool is reused across turns,
+- explicit connect/read timeouts,
+- retries with full-jitter exponential backoff for connection errors,
+  timeouts, 429s and 5xx responses,
+- a semaphore that caps concurrent upstream requests across all sessions,
+  which also bounds the number of open sockets.
+
+`ChatClient.fan_out` sends the same messages to several models at once, so
+comparing N models takes about as long as the slowest one. It uses one
+`AsyncOpenAI` client running on a background event loop owned by the
+`ChatClient`, so its connections are pooled across comparisons too, and
+every fan-out request takes a slot from the same process-wide limit.
+
+Run `python chat_client.py --base-url http://127.0.0.1:8000/api/v1` against
+mock_openrouter_server.py to compare it with a client per request.
+"""
+import argparse
+import asyncio
+import random
+import threading
+import time
+from concurrent.futures import as_completed
+
+from openai import (
+    APIConnectionError,
+    APIError,
+    APITimeoutError,
+    AsyncOpenAI,
+    InternalServerError,
+    OpenAI,
+    RateLimitError,
+    Timeout,
+)
+
+RETRYABLE_ERRORS = (APIConnectionError, APITimeoutError, RateLimitError, InternalServerError)
+
+
+class ChatClient:
+    """Thread-safe wrapper around one pooled OpenAI client."""
+
+    def __init__(
+        self,
+        base_url,
+        api_key,
+        default_headers=None,
+        max_concurrent=8,
+        timeout=60.0,
+        connect_timeout=5.0,
+        max_retries=3,
+        backoff_base=0.5,
+        backoff_cap=8.0,
+    ):
+        # Retries are handled here so they can share the concurrency limit.
+        self.client = OpenAI(
+            base_url=base_url,
+            api_key=api_key,
+            default_headers=default_headers,
+            timeout=Timeout(timeout, connect=connect_timeout),
+            max_retries=0,
+        )
+        self.async_client = AsyncOpenAI(
+            base_url=base_url,
+            api_key=api_key,
+            default_headers=default_headers,
+            timeout=Timeout(timeout, connect=connect_timeout),
+            max_retries=0,
+        )
+        self.slots = threading.BoundedSemaphore(max_concurrent)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.loop = None  # started on the first fan_out
+        self.loop_lock = threading.Lock()
+
+    def _delay(self, attempt):
+        """Full jitter: a random time up to the capped exponential delay."""
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+
+    def _backoff(self, attempt):
+        time.sleep(self._delay(attempt))
+
+    def complete(self, **kwargs):
+        """Blocking chat completion, retried on transient errors."""
+        attempt = 0
+        while True:
+            with self.slots:
+                try:
+                    return self.client.chat.completions.create(**kwargs)
+                except RETRYABLE_ERRORS:
+                    if attempt >= self.max_retries:
+                        raise
+            self._backoff(attempt)
+            attempt += 1
+
+    def stream(self, **kwargs):
+        """Yield chunks of a streamed completion.
+
+        Only opening the stream is retried; once chunks have been yielded an
+        error is raised to the caller. A concurrency slot is held until the
+        stream is finished or closed.
+        """
+        attempt = 0
+        while True:
+            self.slots.acquire()
+            try:
+                stream = self.client.chat.completions.create(stream=True, **kwargs)
+            except RETRYABLE_ERRORS:
+                self.slots.release()
+                if attempt >= self.max_retries:
+                    raise
+                self._backoff(attempt)
+                attempt += 1
+                continue
+            except BaseException:
+                self.slots.release()
+                raise
+            break
+        try:
+            yield from stream
+        finally:
+            stream.close()
+            self.slots.release()
+
+    def _event_loop(self):
+        """The loop the async client runs on; one per ChatClient, started once."""
+        with self.loop_lock:
+            if self.loop is None:
+                self.loop = asyncio.new_event_loop()
+                threading.Thread(target=self.loop.run_forever, name="chat-client-loop", daemon=True).start()
+            return self.loop
+
+    async def _acomplete(self, **kwargs):
+        """Async chat completion under the same concurrency limit and retries as `complete`."""
+        attempt = 0
+        while True:
+            # The limit is shared with the blocking calls, so wait for it off the loop.
+            await asyncio.to_thread(self.slots.acquire)
+            try:
+                return await self.async_client.chat.completions.create(**kwargs)
+            except RETRYABLE_ERRORS:
+                if attempt >= self.max_retries:
+                    raise
+            finally:
+                self.slots.release()
+            await asyncio.sleep(self._delay(attempt))
+            attempt += 1
+
+    async def _ask(self, model, messages, limit):
+        async with limit:
+            start = time.perf_counter()
+            try:
+                completion = await self._acomplete(model=model, messages=messages)
+            except Exception as e:  # one model failing must not end the whole comparison
+                return {"model": model, "content": None, "error": str(e) or type(e).__name__, "latency": time.perf_counter() - start}
+        if not completion.choices:
+            # OpenRouter can answer 200 with {"error": {...}} in place of choices.
+            error = getattr(completion, "error", None)
+            if isinstance(error, dict):
+                error = error.get("message") or str(error)
+            return {"model": model, "content": None, "error": error or "No choices in the response", "latency": time.perf_counter() - start}
+        usage = completion.usage
+        return {
+            "model": model,
+            "content": completion.choices[0].message.content,
+            "error": None,
+            "latency": time.perf_counter() - start,
+            "prompt_tokens": usage.prompt_tokens if usage else None,
+            "completion_tokens": usage.completion_tokens if usage else None,
+        }
+
+    def fan_out(self, models, messages, max_concurrent=4):
+        """Send `messages` to every model concurrently and yield results as they finish.
+
+        Each result is a dict with the model, its answer (or error), latency in
+        seconds and token usage; a model that fails only gets an error result. At most `max_concurrent` of these requests run
+        at once, and each also counts against the client-wide limit.
+        """
+        loop = self._event_loop()
+        limit = asyncio.Semaphore(max_concurrent)  # only used on `loop`
+        futures = [asyncio.run_coroutine_threadsafe(self._ask(model, messages, limit), loop) for model in models]
+        for finished in as_completed(futures):
+            yield finished.result()
+
+    def close(self):
+        self.client.close()
+        if self.loop is not None:
+            asyncio.run_coroutine_threadsafe(self.async_client.close(), self.loop).result()
+            self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+def benchmark(base_url, requests=50, api_key="mock"):
+    """Average latency of a fresh client per request versus one shared client."""
+    messages = [{"role": "user", "content": "how do I read a CSV"}]
+    model = "mock-model"
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        client = OpenAI(base_url=base_url, api_key=api_key)
+        client.chat.completions.create(model=model, messages=messages)
+    fresh_ms = (time.perf_counter() - start) * 1000 / requests
+
+    shared = ChatClient(base_url, api_key)
+    shared.complete(model=model, messages=messages)  # open the connection
+    start = time.perf_counter()
+    for _ in range(requests):
+        shared.complete(model=model, messages=messages)
+    pooled_ms = (time.perf_counter() - start) * 1000 / requests
+
+    print(f"client per request: {fresh_ms:.1f} ms/request")
+    print(f"shared pooled client: {pooled_ms:.1f} ms/request")
+
+    models = [f"mock-model-{i}" for i in range(4)]
+    start = time.perf_counter()
+    results = list(shared.fan_out(models, messages))
+    wall = time.perf_counter() - start
+    print(f"fan-out to {len(models)} models: {wall:.2f}s wall, {sum(r['latency'] for r in results):.2f}s summed latency")
+    shared.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare per-request and shared chat clients.")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000/api/v1")
+    parser.add_argument("--requests", type=int, default=50)
+    args = parser.parse_args()
+    benchmark(args.base_url, args.requests)
@@ -0,0 +1,107 @@
+"""Token-budgeted context window for the OpenRouter chatbot.
+
+Sending the whole of `st.session_state["messages"]` every turn makes
+requests grow with the conversation. `ContextWindow` counts tokens per
+message once (messages are append-only, so only new ones are counted) and
+builds the request from the system prompt plus as many recent messages as
+fit the budget. Older turns are either dropped or replaced by a short
+extractive summary.
+
+Token counts use `tiktoken` when it is installed and a ~4 characters per
+token estimate otherwise.
+"""
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except Exception:  # tiktoken is optional
+    _ENCODING = None
+
+MESSAGE_OVERHEAD = 4  # role and separators per message
+SUMMARY_LINE_CHARS = 80
+SUMMARY_SHARE = 10  # a summary may use up to 1/10 of the budget
+
+
+def count_tokens(text):
+    """Tokens in `text`, exact with tiktoken, estimated without it."""
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text))
+    return (len(text) + 3) // 4
+
+
+class ContextWindow:
+    """Per-conversation token counts and budgeted request building."""
+
+    def __init__(self):
+        self.counts = []
+        self.contents = []
+
+    def sync(self, messages):
+        """Count tokens for messages not seen yet; recount if the history was replaced."""
+        known = len(self.counts)
+        if known and (known > len(messages) or self.contents[-1] is not messages[known - 1]["content"]):
+            self.counts, self.contents = [], []
+            known = 0
+        for message in messages[known:]:
+            self.counts.append(count_tokens(message["content"]) + MESSAGE_OVERHEAD)
+            self.contents.append(message["content"])
+
+    def total(self, messages):
+        self.sync(messages)
+        return sum(self.counts)
+
+    def build(self, messages, budget, summarize=False):
+        """Messages to send, their token count and how many messages were left out.
+
+        Leading system messages are always kept. Then the newest messages are
+        added until the budget is used up; the latest message is kept even if
+        it alone exceeds the budget. With `summarize`, the dropped messages
+        are replaced by one system note listing the earlier user questions.
+        """
+        self.sync(messages)
+        head = 0
+        while head < len(messages) and messages[head]["role"] == "system":
+            head += 1
+        start, used = self._fit(head, budget)
+        if summarize and start > head:
+            # Something is left out, so make room for the summary note.
+            start, used = self._fit(head, budget - budget // SUMMARY_SHARE)
+
+        dropped = messages[head:start]
+        selected = list(messages[:head])
+        if dropped and summarize:
+            note = self._summary(dropped, budget - used)
+            if note is not None:
+                selected.append(note)
+                used += count_tokens(note["content"]) + MESSAGE_OVERHEAD
+        selected.extend(messages[start:])
+        return selected, used, len(dropped)
+
+    def _fit(self, head, budget):
+        """Index of the oldest message that fits after the `head` system messages, and the tokens used."""
+        used = sum(self.counts[:head])
+        start = len(self.counts)
+        while start > head:
+            cost = self.counts[start - 1]
+            if used + cost > budget and start < len(self.counts):
+                break
+            used += cost
+            start -= 1
+        return start, used
+
+    @staticmethod
+    def _summary(dropped, room):
+        """A system note naming the earlier user questions, trimmed to `room` tokens."""
+        lines = []
+        for message in dropped:
+            if message["role"] == "user":
+                line = " ".join(message["content"].split())
+                if len(line) > SUMMARY_LINE_CHARS:
+                    line = line[:SUMMARY_LINE_CHARS - 1] + "…"
+                lines.append(f"- {line}")
+        header = f"Earlier conversation ({len(dropped)} messages) omitted. The user previously asked:"
+        while lines:
+            content = "\n".join([header] + lines)
+            if count_tokens(content) + MESSAGE_OVERHEAD <= room:
+                return {"role": "system", "content": content}
+            lines.pop(0)
+        return None
@@ -0,0 +1,71 @@
+"""Paginated chat history for the OpenRouter chatbot.
+
+Streamlit reruns the whole script on every input, so drawing every past
+message each turn makes long conversations slower to redraw. The app only
+draws the most recent pages of the history, with a "load earlier messages"
+control for the rest.
+
+Pages are counted from the start of the conversation rather than back from
+the newest message. New turns therefore only add elements to the end of the
+visible window instead of shifting every message one place, which lets the
+frontend keep the already rendered messages as they are. The window moves
+only when a new page starts.
+
+Run `python chat_history.py` to time reruns of the app against history
+length, drawing every message versus the paginated window.
+"""
+import argparse
+import os
+import time
+
+HISTORY_PAGE_SIZE = 20  # messages per page
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "openrouter-api-use.py")
+
+
+def history_window(count, pages, page_size=HISTORY_PAGE_SIZE):
+    """Index of the first message to draw for `count` messages.
+
+    Shows the newest `pages` full pages plus the page still being filled, so
+    at least `pages * page_size` messages are visible once there are that many.
+    """
+    return max(0, (count // page_size - pages) * page_size)
+
+
+def fake_history(turns):
+    """A system prompt plus `turns` question/answer pairs with code blocks."""
+    messages = [{"role": "system", "content": "You are a Python instructor."}]
+    for i in range(turns):
+        messages.append({"role": "user", "content": f"Question {i}: how do I sort a list of dicts by key?"})
+        messages.append({"role": "assistant", "content": (
+            f"### Answer {i}\n```python\n" + "rows.sort(key=lambda row: row['name'])\n" * 30 + "```\n"
+        )})
+    return messages
+
+
+def benchmark(turns=(10, 50, 200, 500), reruns=3):
+    """Average rerun time for each history length, all messages versus the paginated window."""
+    from streamlit.testing.v1 import AppTest
+
+    print(f"{'messages':>9} {'all (ms)':>10} {'paged (ms)':>11}")
+    for n in turns:
+        timings = []
+        for pages in (None, 1):
+            at = AppTest.from_file(APP_PATH, default_timeout=120)
+            at.session_state["messages"] = fake_history(n)
+            at.session_state["session_id"] = None
+            at.session_state["first_seq"] = 1
+            at.session_state["history_pages"] = n if pages is None else pages  # n pages show everything
+            at.run()
+            start = time.perf_counter()
+            for _ in range(reruns):
+                at.run()
+            timings.append((time.perf_counter() - start) * 1000 / reruns)
+        print(f"{2 * n:>9,} {timings[0]:>10.1f} {timings[1]:>11.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time chatbot reruns against history length.")
+    parser.add_argument("--turns", type=int, nargs="+", default=[10, 50, 200, 500])
+    parser.add_argument("--reruns", type=int, default=3)
+    args = parser.parse_args()
+    benchmark(args.turns, args.reruns)
@@ -0,0 +1,102 @@
+"""Persistent chat sessions for the OpenRouter chatbot.
+
+`st.session_state["messages"]` is lost on a browser refresh or server
+restart. `SessionStore` keeps every conversation in SQLite:
+
+- WAL journal mode, so readers (other sessions listing chats) never block
+  the writer,
+- append-only writes: each turn inserts its messages, nothing is rewritten,
+- `load_recent` / `load_before` read only the slice of a conversation that
+  is shown, so a long chat never has to be held in memory whole.
+
+Message `seq` 0 is the system prompt; the conversation starts at 1.
+"""
+import sqlite3
+import threading
+import time
+import uuid
+
+TITLE_CHARS = 60
+
+
+class SessionStore:
+    """Thread-safe SQLite store of chat sessions and their messages."""
+
+    def __init__(self, path="chat_sessions.sqlite3"):
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        with self.db:
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "id TEXT PRIMARY KEY, title TEXT, created REAL, updated REAL, message_count INTEGER)"
+            )
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS messages ("
+                "session_id TEXT, seq INTEGER, role TEXT, content TEXT, created REAL, "
+                "PRIMARY KEY (session_id, seq))"
+            )
+            self.db.execute("CREATE INDEX IF NOT EXISTS sessions_updated ON sessions (updated)")
+
+    def create_session(self, system_prompt, title):
+        """New session holding only the system prompt; returns its id."""
+        session_id = uuid.uuid4().hex
+        now = time.time()
+        title = " ".join(title.split())
+        if len(title) > TITLE_CHARS:
+            title = title[:TITLE_CHARS - 1] + "…"
+        with self.lock, self.db:
+            self.db.execute("INSERT INTO sessions VALUES (?, ?, ?, ?, 0)", (session_id, title, now, now))
+            self.db.execute(
+                "INSERT INTO messages VALUES (?, 0, 'system', ?, ?)", (session_id, system_prompt, now)
+            )
+        return session_id
+
+    def append(self, session_id, role, content):
+        """Add one message to the end of a session in a single transaction; returns its seq."""
+        now = time.time()
+        with self.lock, self.db:
+            self.db.execute(
+                "UPDATE sessions SET message_count = message_count + 1, updated = ? WHERE id = ?",
+                (now, session_id),
+            )
+            (seq,) = self.db.execute("SELECT message_count FROM sessions WHERE id = ?", (session_id,)).fetchone()
+            self.db.execute(
+                "INSERT INTO messages VALUES (?, ?, ?, ?, ?)", (session_id, seq, role, content, now)
+            )
+        return seq
+
+    def system_prompt(self, session_id):
+        with self.lock:
+            row = self.db.execute(
+                "SELECT content FROM messages WHERE session_id = ? AND seq = 0", (session_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def load_before(self, session_id, before_seq, limit):
+        """Up to `limit` messages older than `before_seq`, oldest first, and the seq of the first one."""
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT seq, role, content FROM messages "
+                "WHERE session_id = ? AND seq > 0 AND seq < ? ORDER BY seq DESC LIMIT ?",
+                (session_id, before_seq, limit),
+            ).fetchall()
+        rows.reverse()
+        first_seq = rows[0][0] if rows else 1  # nothing older is left
+        return [{"role": role, "content": content} for _, role, content in rows], first_seq
+
+    def load_recent(self, session_id, limit):
+        """The last `limit` messages of a session (without the system prompt) and the seq of the first."""
+        return self.load_before(session_id, 2 ** 62, limit)
+
+    def list_sessions(self, limit=20):
+        """Most recently updated sessions as (id, title, updated, message_count)."""
+        with self.lock:
+            return self.db.execute(
+                "SELECT id, title, updated, message_count FROM sessions ORDER BY updated DESC LIMIT ?",
+                (limit,),
+            ).fetchall()
+
+    def close(self):
+        self.db.close()
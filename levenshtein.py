@@ -0,0 +1,557 @@
+"""Fast Levenshtein distance engines.
+
+`edit_distance` in minimueditdistance.py fills the full (m+1) x (n+1) table
+and stays as the reference. `levenshtein_distance` computes the distance
+only, with the Myers/Hyyrö bit-parallel algorithm: one column of the table
+is packed into the bits of a Python int, so each character of the target
+costs a handful of big-int operations and memory stays O(m).
+
+`edit_script` recovers the edit operations themselves in linear space with
+Hirschberg's divide and conquer. The score rows it needs come from the same
+bit-parallel recurrence, and small subproblems fall back to a full table.
+Operations use the `[Operation, Character, Position, New Character]` rows
+of the reference implementation.
+
+For "within k edits?" checks, `bounded_distance` only fills the diagonal
+band of width 2k+1 and stops as soon as a whole row exceeds k, so it costs
+O(k·n) instead of O(m·n). Each band cell is a Python-level step, though, so
+`levenshtein_distance(..., max_distance=k)` only uses the band when 2k+1 is
+small next to the string length, and otherwise caps the bit-parallel result.
+
+`batch_distances`, `distance_matrix` and `nearest_matches` compare many
+strings at once. The work is split into chunks that run in a process pool,
+and each chunk's result is yielded as soon as it finishes, so callers can
+show partial results.
+
+`TrieIndex` answers "which dictionary words are within k edits of X?"
+without scanning the whole dictionary: it walks a trie of the words and
+carries one DP row per trie node, pruning a branch as soon as every cell in
+its row exceeds k. For k <= 1, `DeletionIndex` is faster still: it hashes
+every word's one-deletion variants into a sorted array, so a lookup is a
+handful of binary searches plus a check of the few candidates. Run
+`python levenshtein.py --benchmark-words 500000` to compare both with a
+linear scan.
+"""
+import argparse
+import heapq
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+# Subproblems with at most this many table cells are aligned with a full table.
+SMALL_TABLE_CELLS = 4096
+# Comparisons per task sent to a worker process.
+DEFAULT_BATCH_CHUNK = 2000
+# Words hashed per batch while building a DeletionIndex, to bound peak memory.
+DELETION_BUILD_BATCH = 50000
+# In CPython one banded DP cell costs about as much as one bit-parallel step
+# spends on this many characters of the shorter string, so a limited distance
+# only uses the band when (2k+1) * BAND_CELL_CHARS is below that length.
+BAND_CELL_CHARS = 512
+
+
+def _match_masks(pattern):
+    """Bit i of masks[c] is set when pattern[i] == c."""
+    masks = {}
+    for i, ch in enumerate(pattern):
+        masks[ch] = masks.get(ch, 0) | (1 << i)
+    return masks
+
+
+def levenshtein_distance(source, target, max_distance=None):
+    """Minimum number of insertions, deletions and replacements turning `source` into `target`.
+
+    With `max_distance`, distances above it are reported as `max_distance + 1`.
+    """
+    if max_distance is None:
+        return _bit_parallel_distance(source, target)
+    over = max_distance + 1
+    if abs(len(source) - len(target)) > max_distance:
+        return over
+    # The band is O(k·n) but pays per cell in Python; the bit-parallel loop is
+    # O(n·m/64) with much cheaper steps, so it wins unless k is tiny next to m.
+    if (2 * max_distance + 1) * BAND_CELL_CHARS < min(len(source), len(target)):
+        return bounded_distance(source, target, max_distance)[0]
+    return min(_bit_parallel_distance(source, target), over)
+
+
+def _bit_parallel_distance(source, target):
+    # The distance is symmetric; pack the shorter string into the bit vectors.
+    if len(source) > len(target):
+        source, target = target, source
+    m = len(source)
+    if m == 0:
+        return len(target)
+
+    masks = _match_masks(source)
+    mask = (1 << m) - 1
+    high = 1 << (m - 1)
+    pv = mask  # vertical deltas of +1
+    mv = 0  # vertical deltas of -1
+    score = m
+    for ch in target:
+        eq = masks.get(ch, 0)
+        xv = eq | mv
+        xh = ((((eq & pv) + pv) & mask) ^ pv) | eq
+        ph = (mv | ~(xh | pv)) & mask
+        mh = pv & xh
+        if ph & high:
+            score += 1
+        elif mh & high:
+            score -= 1
+        ph = ((ph << 1) | 1) & mask
+        mh = (mh << 1) & mask
+        pv = (mh | ~(xv | ph)) & mask
+        mv = ph & xv
+    return score
+
+
+def bounded_distance(source, target, max_distance):
+    """Distance limited to `max_distance`, computed inside a diagonal band.
+
+    Returns `(distance, stopped_at_row)`. When the distance exceeds
+    `max_distance` it is reported as `max_distance + 1`, and
+    `stopped_at_row` is the source row where every cell went over the limit
+    (0 when the length difference alone rules it out). It is None when the
+    whole band was computed.
+    """
+    m, n = len(source), len(target)
+    k = max_distance
+    over = k + 1
+    if abs(m - n) > k:
+        return over, 0
+
+    # Two full-width rows, but only the band [i - k, i + k] is written per row;
+    # cells right of the band are never touched and stay at `over`.
+    prev = [over] * (n + 1)
+    curr = [over] * (n + 1)
+    for j in range(min(n, k) + 1):
+        prev[j] = j
+    for i in range(1, m + 1):
+        lo = max(0, i - k)
+        hi = min(n, i + k)
+        if lo == 0:
+            curr[0] = i if i <= k else over
+            row_min = curr[0]
+            lo = 1
+        else:
+            curr[lo - 1] = over
+            row_min = over
+        ch = source[i - 1]
+        for j in range(lo, hi + 1):
+            if ch == target[j - 1]:
+                value = prev[j - 1]
+            else:
+                value = 1 + min(prev[j - 1], prev[j], curr[j - 1])
+                if value > over:
+                    value = over
+            curr[j] = value
+            if value < row_min:
+                row_min = value
+        if row_min > k:
+            return over, i
+        prev, curr = curr, prev
+    return min(prev[n], over), None
+
+
+def _last_row(source, target):
+    """Distances from all of `source` to every prefix of `target`, as a NumPy array of len(target) + 1."""
+    m, n = len(source), len(target)
+    if n == 0:
+        return np.array([m], dtype=np.int64)
+    masks = _match_masks(target)
+    mask = (1 << n) - 1
+    pv = mask
+    mv = 0
+    for ch in source:
+        eq = masks.get(ch, 0)
+        xv = eq | mv
+        xh = ((((eq & pv) + pv) & mask) ^ pv) | eq
+        ph = (mv | ~(xh | pv)) & mask
+        mh = pv & xh
+        ph = ((ph << 1) | 1) & mask
+        mh = (mh << 1) & mask
+        pv = (mh | ~(xv | ph)) & mask
+        mv = ph & xv
+
+    # Bit j of pv/mv is the +1/-1 step between target prefixes j and j + 1.
+    size = (n + 7) // 8
+    plus = np.unpackbits(np.frombuffer(pv.to_bytes(size, "little"), dtype=np.uint8), bitorder="little")[:n]
+    minus = np.unpackbits(np.frombuffer(mv.to_bytes(size, "little"), dtype=np.uint8), bitorder="little")[:n]
+    row = np.empty(n + 1, dtype=np.int64)
+    row[0] = m
+    np.cumsum(plus.astype(np.int64) - minus, out=row[1:])
+    row[1:] += m
+    return row
+
+
+def _align_table(source, target, offset):
+    """Edit operations for a small subproblem, backtracking through a full table like `edit_distance`."""
+    m, n = len(source), len(target)
+    dp = [list(range(n + 1))]
+    for i in range(1, m + 1):
+        prev = dp[-1]
+        row = [i] + [0] * n
+        for j in range(1, n + 1):
+            if source[i - 1] == target[j - 1]:
+                row[j] = prev[j - 1]
+            else:
+                row[j] = 1 + min(prev[j], row[j - 1], prev[j - 1])
+        dp.append(row)
+
+    edits = []
+    i, j = m, n
+    while i > 0 or j > 0:
+        if i > 0 and j > 0 and source[i - 1] == target[j - 1]:
+            i -= 1
+            j -= 1
+        elif i > 0 and dp[i][j] == dp[i - 1][j] + 1:
+            edits.append(["Delete", source[i - 1], offset + i, "-"])
+            i -= 1
+        elif j > 0 and dp[i][j] == dp[i][j - 1] + 1:
+            edits.append(["Insert", target[j - 1], offset + i + 1, "-"])
+            j -= 1
+        else:
+            edits.append(["Replace", source[i - 1], offset + i, target[j - 1]])
+            i -= 1
+            j -= 1
+    return edits[::-1]
+
+
+def _hirschberg(source, target, offset, edits):
+    m, n = len(source), len(target)
+    if m == 0:
+        edits.extend(["Insert", ch, offset + 1, "-"] for ch in target)
+    elif n == 0:
+        edits.extend(["Delete", ch, offset + i + 1, "-"] for i, ch in enumerate(source))
+    elif m == 1 or m * n <= SMALL_TABLE_CELLS:
+        edits.extend(_align_table(source, target, offset))
+    else:
+        mid = m // 2
+        forward = _last_row(source[:mid], target)
+        backward = _last_row(source[mid:][::-1], target[::-1])[::-1]
+        split = int(np.argmin(forward + backward))
+        _hirschberg(source[:mid], target[:split], offset, edits)
+        _hirschberg(source[mid:], target[split:], offset + mid, edits)
+
+
+def edit_script(source, target):
+    """Distance and edit operations between two strings, in O(len(source) + len(target)) memory.
+
+    Returns `(distance, edits)` like `edit_distance`; positions refer to the
+    original source string.
+    """
+    edits = []
+    _hirschberg(source, target, 0, edits)
+    return len(edits), edits
+
+
+def _distance_pairs(pairs, max_distance):
+    return [levenshtein_distance(a, b, max_distance) for a, b in pairs]
+
+
+def _distance_rows(sources, targets, max_distance):
+    return [[levenshtein_distance(a, b, max_distance) for b in targets] for a in sources]
+
+
+def _run_chunks(fn, tasks, workers):
+    """Yield (task index, result) as tasks finish, in a process pool when workers > 1."""
+    if workers <= 1:
+        for index, args in enumerate(tasks):
+            yield index, fn(*args)
+        return
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        futures = {executor.submit(fn, *args): index for index, args in enumerate(tasks)}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+    finally:
+        # Also runs when the caller stops iterating early (e.g. a Streamlit rerun).
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def batch_distances(pairs, workers=1, chunk_size=DEFAULT_BATCH_CHUNK, max_distance=None):
+    """Distances for a list of (source, target) pairs.
+
+    Yields `(offset, distances)` per chunk in completion order; `distances[i]`
+    belongs to `pairs[offset + i]`.
+    """
+    tasks = [(pairs[i:i + chunk_size], max_distance) for i in range(0, len(pairs), chunk_size)]
+    for index, distances in _run_chunks(_distance_pairs, tasks, workers):
+        yield index * chunk_size, distances
+
+
+def distance_matrix(words, workers=1, chunk_size=DEFAULT_BATCH_CHUNK, max_distance=None):
+    """All-pairs distances for `words`, yielded as `(first_row, rows)` blocks in completion order."""
+    rows_per_task = max(1, chunk_size // max(1, len(words)))
+    tasks = [(words[i:i + rows_per_task], words, max_distance) for i in range(0, len(words), rows_per_task)]
+    for index, rows in _run_chunks(_distance_rows, tasks, workers):
+        yield index * rows_per_task, rows
+
+
+def nearest_matches(query, words, k=10, workers=1, chunk_size=DEFAULT_BATCH_CHUNK, max_distance=None):
+    """The `k` closest words to `query`, refined as chunks finish.
+
+    Yields `(words_done, matches)` after each chunk, where `matches` is the
+    current top-k as a sorted list of (distance, word). Repeated words are
+    compared once, so `words_done` counts distinct words.
+    """
+    words = list(dict.fromkeys(words))
+    best = []
+    done = 0
+    pairs = [(query, word) for word in words]
+    for offset, distances in batch_distances(pairs, workers, chunk_size, max_distance):
+        chunk = words[offset:offset + len(distances)]
+        candidates = zip(distances, chunk)
+        if max_distance is not None:
+            candidates = ((d, w) for d, w in candidates if d <= max_distance)
+        best = heapq.nsmallest(k, best + list(candidates))
+        done += len(distances)
+        yield done, best
+
+
+def _deletions(word, k):
+    """`word` and every string made by deleting up to `k` of its characters."""
+    variants = {word}
+    frontier = variants
+    for _ in range(k):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        variants |= frontier
+    return variants
+
+
+def _one_edit_distance(source, target):
+    """Distance capped at 2, for the k <= 1 candidate check: a few string compares instead of a DP."""
+    if source == target:
+        return 0
+    m, n = len(source), len(target)
+    if abs(m - n) > 1:
+        return 2
+    i = 0
+    while i < m and i < n and source[i] == target[i]:
+        i += 1
+    if m == n:
+        return 1 if source[i + 1:] == target[i + 1:] else 2
+    if m > n:
+        return 1 if source[i + 1:] == target[i:] else 2
+    return 1 if source[i:] == target[i + 1:] else 2
+
+
+class DeletionIndex:
+    """Fuzzy dictionary lookup for small distances by symmetric deletions.
+
+    Two words are within k edits only if deleting at most k characters from
+    each leaves a common string (a replacement is one deletion on each
+    side). The hashes of every word's deletion variants are kept in one
+    sorted NumPy array with the word ids alongside, so `search` hashes the
+    query's variants, finds the candidates with `searchsorted` and verifies
+    only those. There are about len(word)**k / k! variants per word, so the
+    index is built for one `max_distance`; 1 keeps it small (about 12 bytes
+    per variant) and fast, and larger distances are better served by
+    `TrieIndex`. Hashes are Python's, so an index is only valid in the
+    process that built it.
+    """
+
+    def __init__(self, words=(), max_distance=1):
+        self.words = list(dict.fromkeys(words))
+        self.max_distance = max_distance
+        keys, ids = [np.empty(0, dtype=np.int64)], [np.empty(0, dtype=np.int32)]
+        for start in range(0, len(self.words), DELETION_BUILD_BATCH):
+            batch_keys, batch_ids = [], []
+            for word_id in range(start, min(start + DELETION_BUILD_BATCH, len(self.words))):
+                for variant in _deletions(self.words[word_id], max_distance):
+                    batch_keys.append(hash(variant))
+                    batch_ids.append(word_id)
+            keys.append(np.array(batch_keys, dtype=np.int64))
+            ids.append(np.array(batch_ids, dtype=np.int32))
+        keys = np.concatenate(keys)
+        order = np.argsort(keys, kind="stable")
+        self.keys = keys[order]
+        self.ids = np.concatenate(ids)[order]
+
+    def __len__(self):
+        return len(self.words)
+
+    def search(self, query, max_distance):
+        """Words within `max_distance` of `query`, as a sorted list of (distance, word)."""
+        if max_distance > self.max_distance:
+            raise ValueError(f"index was built for distances up to {self.max_distance}, not {max_distance}")
+        hashes = np.array([hash(v) for v in _deletions(query, max_distance)], dtype=np.int64)
+        starts = np.searchsorted(self.keys, hashes, "left").tolist()
+        ends = np.searchsorted(self.keys, hashes, "right").tolist()
+        candidates = set()
+        for start, end in zip(starts, ends):
+            if start < end:
+                candidates.update(self.ids[start:end].tolist())
+
+        words = self.words
+        results = []
+        for word_id in candidates:
+            word = words[word_id]
+            if max_distance <= 1:
+                distance = _one_edit_distance(query, word)
+            else:
+                distance = levenshtein_distance(query, word, max_distance)
+            if distance <= max_distance:
+                results.append((distance, word))
+        results.sort()
+        return results
+
+
+class _TrieNode:
+    __slots__ = ("children", "word")
+
+    def __init__(self):
+        self.children = {}
+        self.word = None
+
+
+class TrieIndex:
+    """Fuzzy dictionary lookup by Levenshtein distance over a character trie."""
+
+    def __init__(self, words=()):
+        self.root = _TrieNode()
+        self.size = 0
+        for word in words:
+            self.add(word)
+
+    def __len__(self):
+        return self.size
+
+    def add(self, word):
+        node = self.root
+        for ch in word:
+            child = node.children.get(ch)
+            if child is None:
+                child = node.children[ch] = _TrieNode()
+            node = child
+        if node.word is None:
+            node.word = word
+            self.size += 1
+
+    def search(self, query, max_distance):
+        """Words within `max_distance` of `query`, as a sorted list of (distance, word)."""
+        k = max_distance
+        over = k + 1
+        columns = len(query) + 1
+        results = []
+        if self.root.word is not None and len(query) <= k:
+            results.append((len(query), self.root.word))
+        first = [c if c <= k else over for c in range(columns)]
+        stack = [(child, ch, first, 1) for ch, child in self.root.children.items()]
+        while stack:
+            node, ch, prev, depth = stack.pop()
+            # Only the band |col - depth| <= k can stay within k; the rest is `over`.
+            lo = depth - k if depth > k else 0
+            hi = depth + k if depth + k < columns else columns - 1
+            row = [over] * columns
+            if lo == 0:
+                row[0] = depth if depth <= k else over
+                lo = 1
+            best = row[0]
+            left = row[lo - 1]
+            for col in range(lo, hi + 1):
+                if query[col - 1] == ch:
+                    value = prev[col - 1]
+                else:
+                    value = prev[col - 1]
+                    if prev[col] < value:
+                        value = prev[col]
+                    if left < value:
+                        value = left
+                    value += 1
+                    if value > over:
+                        value = over
+                row[col] = left = value
+                if value < best:
+                    best = value
+            if node.word is not None and row[-1] <= k:
+                results.append((row[-1], node.word))
+            if best < k:
+                stack.extend((child, next_ch, row, depth + 1) for next_ch, child in node.children.items())
+            elif best == k:
+                # Every live cell is exactly k, so only a matching character
+                # can keep a child within k: look those up instead of trying all children.
+                children = node.children
+                seen = set()
+                for col in range(lo - 1, min(hi + 1, columns - 1)):
+                    if row[col] == k:
+                        next_ch = query[col]
+                        if next_ch not in seen:
+                            seen.add(next_ch)
+                            child = children.get(next_ch)
+                            if child is not None:
+                                stack.append((child, next_ch, row, depth + 1))
+        results.sort()
+        return results
+
+
+def linear_search(query, words, max_distance):
+    """Brute-force counterpart of `TrieIndex.search`, for comparison."""
+    results = []
+    for word in words:
+        distance = levenshtein_distance(query, word, max_distance)
+        if distance <= max_distance:
+            results.append((distance, word))
+    results.sort()
+    return results
+
+
+def benchmark(num_words=500000, max_distance=1, queries=200, dictionary=None, seed=0):
+    """Compare TrieIndex lookups with a linear scan over the same dictionary."""
+    rng = random.Random(seed)
+    if dictionary:
+        with open(dictionary, encoding="utf-8") as f:
+            words = [line.strip() for line in f if line.strip()]
+    else:
+        alphabet = "abcdefghijklmnopqrstuvwxyz"
+        words = ["".join(rng.choice(alphabet) for _ in range(rng.randint(3, 12))) for _ in range(num_words)]
+
+    start = time.perf_counter()
+    index = TrieIndex(words)
+    print(f"trie: indexed {len(index):,} words in {time.perf_counter() - start:.1f}s")
+    deletion_index = None
+    if max_distance <= 1:
+        start = time.perf_counter()
+        deletion_index = DeletionIndex(words, max_distance=1)
+        print(f"deletion index: {len(deletion_index.keys):,} variants in {time.perf_counter() - start:.1f}s")
+
+    samples = []
+    for _ in range(queries):
+        word = list(rng.choice(words))
+        word[rng.randrange(len(word))] = rng.choice("abcdefghijklmnopqrstuvwxyz")
+        samples.append("".join(word))
+
+    start = time.perf_counter()
+    for query in samples:
+        index.search(query, max_distance)
+    trie_ms = (time.perf_counter() - start) * 1000 / len(samples)
+    fastest_ms = trie_ms
+    if deletion_index is not None:
+        start = time.perf_counter()
+        for query in samples:
+            deletion_index.search(query, max_distance)
+        fastest_ms = (time.perf_counter() - start) * 1000 / len(samples)
+
+    scanned = samples[:max(1, len(samples) // 20)]
+    start = time.perf_counter()
+    for query in scanned:
+        linear_search(query, words, max_distance)
+    scan_ms = (time.perf_counter() - start) * 1000 / len(scanned)
+    deletion = f"deletion index {fastest_ms:.3f} ms/query, " if deletion_index is not None else ""
+    print(
+        f"k={max_distance}: trie {trie_ms:.3f} ms/query, {deletion}"
+        f"linear scan {scan_ms:.1f} ms/query, x{scan_ms / fastest_ms:,.0f}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark TrieIndex and DeletionIndex against a linear scan.")
+    parser.add_argument("--benchmark-words", type=int, default=500000, help="size of the synthetic dictionary")
+    parser.add_argument("--dictionary", help="word list to use instead of synthetic words (one per line)")
+    parser.add_argument("--max-distance", type=int, default=1)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+    benchmark(args.benchmark_words, args.max_distance, args.queries, args.dictionary)
@@ -1,6 +1,23 @@
 import streamlit as st
+import io
+import os
+import time
 import numpy as np
 import pandas as pd
+from levenshtein import (
+    batch_distances,
+    bounded_distance,
+    DeletionIndex,
+    distance_matrix,
+    edit_script,
+    levenshtein_distance,
+    linear_search,
+    nearest_matches,
+    TrieIndex,
+)
+
+MATRIX_MAX_WORDS = 2000  # words in a distance matrix (the matrix grows with the square)
+MATRIX_PREVIEW = 200  # rows and columns shown on the page
 
 def edit_distance(source, target):
     m, n = len(source), len(target)
@@ -38,14 +55,61 @@ def edit_distance(source, target):
     
     return dp[m][n], edits[::-1]
 
+def parse_word_list(data, name):
+    """Words from a .txt (one per line) or the first column of a .csv."""
+    if name.endswith(".csv"):
+        try:
+            return pd.read_csv(io.BytesIO(data), dtype=str, keep_default_na=False).iloc[:, 0].tolist()
+        except pd.errors.EmptyDataError:
+            return []
+    return [line.strip() for line in data.decode("utf-8", errors="replace").splitlines() if line.strip()]
+
+def read_word_list(uploaded):
+    return parse_word_list(uploaded.getvalue(), uploaded.name)
+
+@st.cache_resource(show_spinner="Building fuzzy index...")
+def build_index(data, name):
+    """Build the deletion index (distances up to 1) once per distinct dictionary file and share it across sessions."""
+    words = parse_word_list(data, name)
+    return DeletionIndex(words), words
+
+@st.cache_resource(show_spinner="Building trie for larger distances...")
+def build_trie(data, name):
+    """Trie for lookups beyond the deletion index's distance; only built when one is asked for."""
+    return TrieIndex(parse_word_list(data, name))
+
 st.title("Minimum Edit Distance Calculator")
 
 source = st.text_input("Enter Source String:", "")
 target = st.text_input("Enter Target String:", "")
+engine = st.radio(
+    "Engine",
+    ["Full table", "Linear memory (Hirschberg)", "Distance only"],
+    horizontal=True,
+    help="Full table is the reference DP. Hirschberg finds the edit steps in linear memory; "
+         "distance only uses the bit-parallel engine and skips the edit steps.",
+)
+use_threshold = st.checkbox("Only check whether the strings are within k edits")
+max_distance = st.number_input("k (maximum distance)", min_value=0, value=3, step=1, disabled=not use_threshold)
 
 if st.button("Calculate Edit Distance"):
-    if source and target:
-        distance, operations = edit_distance(source, target)
+    if source and target and use_threshold:
+        distance, stopped_at = bounded_distance(source, target, int(max_distance))
+        if distance <= max_distance:
+            st.write(f"### ✅ Within {max_distance} edits: distance {distance}")
+        else:
+            st.write(f"### ❌ More than {max_distance} edits apart")
+        if stopped_at == 0:
+            st.info("Stopped before computing anything: the length difference alone exceeds k.")
+        elif stopped_at is not None:
+            st.info(f"Stopped early at row {stopped_at} of {len(source)}: every cell in the band exceeded k.")
+    elif source and target:
+        if engine == "Distance only":
+            distance, operations = levenshtein_distance(source, target), []
+        elif engine == "Linear memory (Hirschberg)":
+            distance, operations = edit_script(source, target)
+        else:
+            distance, operations = edit_distance(source, target)
         st.write(f"### Minimum Edit Distance: {distance}")
         
         if operations:
@@ -57,6 +121,107 @@ if st.button("Calculate Edit Distance"):
     else:
         st.warning("Please enter both source and target strings.")
 
+st.header("📁 Batch Mode")
+batch_mode = st.radio(
+    "Compare",
+    ["Query vs word list", "Pairs in a CSV", "Distance matrix"],
+    horizontal=True,
+)
+uploaded = st.file_uploader(
+    "Upload a CSV with source/target columns" if batch_mode == "Pairs in a CSV" else "Upload a word list (.txt or .csv)",
+    type=["csv", "txt"],
+)
+if batch_mode == "Query vs word list":
+    query = st.text_input("Query word:", "")
+    top_k = st.number_input("Top-k matches", min_value=1, max_value=1000, value=10)
+elif batch_mode == "Distance matrix":
+    st.caption(f"Uses at most the first {MATRIX_MAX_WORDS:,} distinct words of the list.")
+col1, col2 = st.columns(2)
+with col1:
+    workers = st.number_input("Worker processes", min_value=1, max_value=os.cpu_count() or 1, value=1)
+with col2:
+    chunk_size = st.number_input("Comparisons per chunk", min_value=100, value=2000, step=100)
+batch_limit = st.number_input("Skip distances above (0 = no limit)", min_value=0, value=0)
+batch_max_distance = int(batch_limit) or None
+
+if st.button("Run Batch") and uploaded is not None:
+    progress = st.progress(0.0)
+    table = st.empty()
+    workers, chunk_size = int(workers), int(chunk_size)
+
+    if batch_mode == "Query vs word list":
+        words = list(dict.fromkeys(read_word_list(uploaded)))
+        for done, matches in nearest_matches(query, words, int(top_k), workers, chunk_size, batch_max_distance):
+            progress.progress(done / len(words), text=f"{done:,} / {len(words):,} words")
+            table.dataframe(pd.DataFrame(matches, columns=["Distance", "Word"]))
+
+    elif batch_mode == "Pairs in a CSV":
+        try:
+            pairs_df = pd.read_csv(uploaded, dtype=str, keep_default_na=False)
+        except pd.errors.EmptyDataError:
+            pairs_df = pd.DataFrame()
+        if len(pairs_df.columns) < 2:
+            st.error("The CSV needs two columns: \"source\" and \"target\", or any two columns (the first two are used).")
+        else:
+            columns = ["source", "target"] if {"source", "target"} <= set(pairs_df.columns) else list(pairs_df.columns[:2])
+            pairs = list(zip(pairs_df[columns[0]], pairs_df[columns[1]]))
+            distances = [None] * len(pairs)
+            done = 0
+            for offset, chunk in batch_distances(pairs, workers, chunk_size, batch_max_distance):
+                distances[offset:offset + len(chunk)] = chunk
+                done += len(chunk)
+                progress.progress(done / len(pairs), text=f"{done:,} / {len(pairs):,} pairs")
+                pairs_df["Distance"] = distances
+                table.dataframe(pairs_df.head(1000))
+            st.download_button("Download results", pairs_df.to_csv(index=False), "distances.csv", "text/csv")
+
+    else:
+        # Duplicates would only repeat rows and columns (and break the table's column names)
+        words = list(dict.fromkeys(read_word_list(uploaded)))
+        if len(words) > MATRIX_MAX_WORDS:
+            st.warning(
+                f"The distance matrix is limited to {MATRIX_MAX_WORDS:,} words; "
+                f"using the first {MATRIX_MAX_WORDS:,} of {len(words):,} distinct words."
+            )
+            words = words[:MATRIX_MAX_WORDS]
+        st.caption(f"The preview shows up to {MATRIX_PREVIEW} x {MATRIX_PREVIEW}; the download has the full matrix.")
+        matrix = np.full((len(words), len(words)), -1, dtype=int)
+        done = 0
+        for first_row, rows in distance_matrix(words, workers, chunk_size, batch_max_distance):
+            matrix[first_row:first_row + len(rows)] = rows
+            done += len(rows)
+            progress.progress(done / len(words), text=f"{done:,} / {len(words):,} rows")
+            preview = words[:MATRIX_PREVIEW]
+            table.dataframe(pd.DataFrame(matrix[:MATRIX_PREVIEW, :MATRIX_PREVIEW], index=preview, columns=preview))
+        st.download_button(
+            "Download matrix",
+            pd.DataFrame(matrix, index=words, columns=words).to_csv(),
+            "distance_matrix.csv",
+            "text/csv",
+        )
+
+st.header("🔎 Fuzzy Dictionary Lookup")
+dictionary = st.file_uploader("Upload a dictionary (.txt or .csv)", type=["csv", "txt"], key="dictionary")
+if dictionary is not None:
+    index, dictionary_words = build_index(dictionary.getvalue(), dictionary.name)
+    st.caption(f"{len(index):,} words indexed")
+    lookup = st.text_input("Look up word:", "")
+    lookup_k = st.number_input("Maximum distance", min_value=0, max_value=5, value=1, key="lookup_k")
+    compare_scan = st.checkbox("Compare with a linear scan")
+    if lookup:
+        searcher = index if lookup_k <= index.max_distance else build_trie(dictionary.getvalue(), dictionary.name)
+        start = time.perf_counter()
+        matches = searcher.search(lookup, int(lookup_k))
+        lookup_ms = (time.perf_counter() - start) * 1000
+        method = "deletion index" if searcher is index else "trie"
+        st.write(f"**{len(matches):,} matches** in {lookup_ms:.2f} ms ({method})")
+        st.dataframe(pd.DataFrame(matches[:1000], columns=["Distance", "Word"]))
+        if compare_scan:
+            start = time.perf_counter()
+            linear_search(lookup, dictionary_words, int(lookup_k))
+            scan_ms = (time.perf_counter() - start) * 1000
+            st.write(f"Linear scan: {scan_ms:.1f} ms ({scan_ms / max(lookup_ms, 1e-6):,.0f}x slower)")
+
 if st.button("Show Algorithm"):
     st.write("""
     ### Minimum Edit Distance Algorithm:
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Mock OpenAI-compatible chat server for testing the OpenRouter chatbot offline.
+
+Serves POST /api/v1/chat/completions (and /v1/chat/completions) with canned
+answers, either as one JSON response or as a server-sent event stream when
+the request sets "stream": true. Latency and generation speed are
+configurable so streaming metrics can be checked.
+
+    python mock_openrouter_server.py --port 8000 --latency 0.3 --tokens-per-second 40
+    OPENROUTER_BASE_URL=http://localhost:8000/api/v1 streamlit run openrouter-api-use.py
+"""
+
+import argparse
+import json
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+COMPLETION_PATHS = ("/api/v1/chat/completions", "/v1/chat/completions")
+
+
+def canned_answer(messages):
+    """A short tutorial-shaped answer that echoes the last user message."""
+    question = next((m["content"] for m in reversed(messages) if m.get("role") == "user"), "")
+    return (
+        "### Problem Explanation\n"
+        f"You asked: {question}\n\n"
+        "### Python Code Example\n"
+        "```python\n"
+        "# Print a greeting\n"
+        "print(\"Hello from the mock server\")\n"
+        "```\n\n"
+        "### Step-by-Step Explanation\n"
+        "This reply comes from the local mock server, so no API key is needed.\n\n"
+        "### Usage Example\n"
+        "Run the snippet with `python example.py`.\n\n"
+        "### Common Pitfalls & Tips\n"
+        "Point OPENROUTER_BASE_URL back at OpenRouter for real answers."
+    )
+
+
+def split_tokens(text):
+    """Split text into word-sized pieces that keep their trailing whitespace."""
+    tokens, current = [], ""
+    for ch in text:
+        current += ch
+        if ch.isspace():
+            tokens.append(current)
+            current = ""
+    if current:
+        tokens.append(current)
+    return tokens
+
+
+def count_prompt_tokens(messages):
+    return sum(len(str(m.get("content", "")).split()) for m in messages)
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    latency = 0.0
+    tokens_per_second = 50.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        if self.path.rstrip("/") not in COMPLETION_PATHS:
+            self.send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self.send_json(400, {"error": {"message": "Invalid JSON body"}})
+            return
+
+        messages = body.get("messages", [])
+        model = body.get("model", "mock-model")
+        answer = canned_answer(messages)
+        tokens = split_tokens(answer)
+        usage = {
+            "prompt_tokens": count_prompt_tokens(messages),
+            "completion_tokens": len(tokens),
+            "total_tokens": count_prompt_tokens(messages) + len(tokens),
+        }
+        time.sleep(self.latency)
+
+        if body.get("stream"):
+            include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+            self.stream_answer(model, tokens, usage if include_usage else None)
+        else:
+            self.send_json(200, {
+                "id": f"chatcmpl-{uuid.uuid4().hex}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": answer},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage,
+            })
+
+    def send_json(self, status, payload):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_chunk(self, data):
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def send_event(self, payload):
+        self.send_chunk(b"data: " + json.dumps(payload).encode("utf-8") + b"\n\n")
+
+    def stream_answer(self, model, tokens, usage):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        base = {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+        }
+        delay = 1.0 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+        self.send_event({**base, "choices": [{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}]})
+        for token in tokens:
+            time.sleep(delay)
+            self.send_event({**base, "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]})
+        self.send_event({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+        if usage is not None:
+            self.send_event({**base, "choices": [], "usage": usage})
+        self.send_chunk(b"data: [DONE]\n\n")
+        self.send_chunk(b"")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock OpenAI-compatible chat completions server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.3, help="seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0, help="streaming speed")
+    args = parser.parse_args()
+
+    MockHandler.latency = args.latency
+    MockHandler.tokens_per_second = args.tokens_per_second
+    server = ThreadingHTTPServer((args.host, args.port), MockHandler)
+    print(f"🤖 Mock OpenRouter server on http://{args.host}:{args.port}/api/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Mock server stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,171 @@
 import streamlit as st
-from openai import OpenAI
+import os
+import time
+from chat_cache import ResponseCache
+from chat_client import ChatClient
+from chat_context import ContextWindow
+from chat_history import HISTORY_PAGE_SIZE, history_window
+from chat_store import SessionStore
 
 # --- CONFIG ---
 API_KEY = "YOUR_API_KEY"  # Replace with st.secrets["openrouter_api_key"]
+# Point at mock_openrouter_server.py (http://localhost:8000/api/v1) to test offline
+BASE_URL = os.environ.get("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
 SITE_URL = "http://localhost"
 SITE_NAME = "OpenRouter Streamlit Chat"
+MODEL = "qwen/qwen3-4b:free"
+HEADERS = {
+    "HTTP-Referer": SITE_URL,
+    "X-Title": SITE_NAME,
+}
+COMPARE_MODELS = [
+    MODEL,
+    "meta-llama/llama-3.3-8b-instruct:free",
+    "mistralai/mistral-7b-instruct:free",
+    "google/gemma-3-4b-it:free",
+]
+COMPARE_CONCURRENCY = 4  # requests in flight per comparison
+MAX_CONCURRENT_REQUESTS = 8  # upstream requests in flight across all sessions
+REQUEST_TIMEOUT = 60.0  # seconds
+CONNECT_TIMEOUT = 5.0  # seconds
+MAX_RETRIES = 3
+CONTEXT_BUDGET = 4096  # default prompt-token budget per request
+CACHE_PATH = "chat_cache.sqlite3"
+CACHE_TTL = 24 * 3600  # seconds
+CACHE_MEMORY_ITEMS = 256
+CACHE_DISK_ITEMS = 10000
+SESSIONS_PATH = "chat_sessions.sqlite3"
+RECENT_MESSAGES = 40  # messages loaded when a chat is opened
+SESSION_LIST_SIZE = 20
 
 st.set_page_config(page_title="OpenRouter Chat", layout="centered")
 st.title("🤖 OpenRouter Chatbot")
 st.subheader("Your personal assistant for Python code examples")
 
-# --- Initialize session state ---
-if "messages" not in st.session_state:
-    st.session_state["messages"] = [
-        {"role": "system", "content": """Act like a senior Python instructor and code documentation specialist.  
+with st.sidebar:
+    sessions_panel = st.container()
+    stream_replies = st.toggle("Stream responses", value=True, help="Show tokens as they arrive.")
+    context_budget = st.number_input(
+        "Context budget (tokens)",
+        min_value=256,
+        value=CONTEXT_BUDGET,
+        step=256,
+        help="Prompt tokens sent per request. The system prompt is always kept; older turns are left out first.",
+    )
+    summarize_old = st.toggle(
+        "Summarize dropped turns",
+        value=True,
+        help="Replace left-out turns with a short list of the earlier questions instead of dropping them silently.",
+    )
+    use_cache = st.toggle("Reuse cached answers", value=True, help="Answer repeated questions from the response cache.")
+    compare_mode = st.toggle("Compare models", help="Send each question to several models at once.")
+    compare_models = st.multiselect(
+        "Models", COMPARE_MODELS, default=COMPARE_MODELS[:2], max_selections=4, disabled=not compare_mode
+    )
+    cache_panel = st.container()
+
+
+@st.cache_resource
+def get_client():
+    """One pooled client per process, shared by every session."""
+    return ChatClient(
+        base_url=BASE_URL,
+        api_key=API_KEY,
+        default_headers=HEADERS,
+        max_concurrent=MAX_CONCURRENT_REQUESTS,
+        timeout=REQUEST_TIMEOUT,
+        connect_timeout=CONNECT_TIMEOUT,
+        max_retries=MAX_RETRIES,
+    )
+
+
+@st.cache_resource
+def get_cache():
+    """Response cache shared by every session."""
+    return ResponseCache(CACHE_PATH, ttl=CACHE_TTL, memory_items=CACHE_MEMORY_ITEMS, disk_items=CACHE_DISK_ITEMS)
+
+
+def stream_completion(client, messages, stats):
+    """Yield content deltas from a streamed completion, recording timing in `stats`."""
+    start = time.perf_counter()
+    stream = client.stream(
+        model=MODEL,
+        messages=messages,
+        stream_options={"include_usage": True},
+    )
+    for chunk in stream:
+        if chunk.usage:
+            stats["completion_tokens"] = chunk.usage.completion_tokens
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if delta:
+            if "ttft" not in stats:
+                stats["ttft"] = time.perf_counter() - start
+            stats["chunks"] = stats.get("chunks", 0) + 1
+            yield delta
+    stats["total"] = time.perf_counter() - start
+
+
+def render_comparison(client, messages, models, cache):
+    """Ask every model at once and fill one column per model as its answer arrives.
+
+    Returns the answer of the first model that succeeded, which is kept in
+    the conversation history.
+    """
+    slots = {}
+    for model, column in zip(models, st.columns(len(models))):
+        column.markdown(f"**{model}**")
+        slots[model] = column.empty()
+
+    answers, pending = {}, []
+    for model in models:
+        cached = cache.get(model, messages) if cache else None
+        if cached is not None:
+            answers[model] = cached
+            with slots[model].container():
+                st.markdown(cached)
+                st.caption("⚡ Cached answer")
+        else:
+            slots[model].info("⏳ Waiting for answer...")
+            pending.append(model)
+
+    if pending:
+        start = time.perf_counter()
+        latencies = []
+        # Same pooled client and process-wide request limit as single answers
+        for result in client.fan_out(pending, messages, max_concurrent=COMPARE_CONCURRENCY):
+            latencies.append(result["latency"])
+            with slots[result["model"]].container():
+                if result["error"]:
+                    st.error(f"⚠️ Error: {result['error']}")
+                    continue
+                st.markdown(result["content"])
+                st.caption(
+                    f"⏱️ {result['latency']:.2f}s · {result['prompt_tokens']} prompt / "
+                    f"{result['completion_tokens']} completion tokens"
+                )
+            answers[result["model"]] = result["content"]
+            if cache:
+                cache.put(result["model"], messages, result["content"])
+        st.caption(f"🏁 {len(pending)} models in {time.perf_counter() - start:.2f}s (sum of calls {sum(latencies):.2f}s)")
+    return next((answers[m] for m in models if m in answers), "⚠️ Error: no model returned an answer")
+
+
+def format_context(prompt_tokens, history_tokens, dropped):
+    """Caption with the prompt size and how much of the history was left out."""
+    note = f" · {dropped} older messages left out" if dropped > 0 else ""
+    return f"📨 Prompt ~{prompt_tokens:,} of {history_tokens:,} history tokens{note}"
+
+
+def format_stats(stats):
+    """Caption with time-to-first-token and generation speed."""
+    tokens = stats.get("completion_tokens") or stats.get("chunks", 0)
+    generation = stats.get("total", 0) - stats.get("ttft", 0)
+    speed = f"{tokens / generation:.1f} tokens/sec" if generation > 0 else "n/a"
+    return f"⏱️ First token {stats.get('ttft', 0):.2f}s · {tokens} tokens · {speed}"
+
+SYSTEM_PROMPT = """Act like a senior Python instructor and code documentation specialist.  
 Your role is to provide Python code examples in a structured, professional, and easy-to-follow way.  
 
 Objective:  
@@ -41,13 +193,75 @@ Instructions (step by step):
 Final Requirement:  
 Always maintain this structured template, even for short code snippets, so the answer looks consistent and professional.  
 
-"""}
-    ]
+"""
+
+
+@st.cache_resource
+def get_store():
+    """Session store shared by every session."""
+    return SessionStore(SESSIONS_PATH)
+
+
+def reset_view(messages):
+    st.session_state["messages"] = messages
+    st.session_state["context"] = ContextWindow()
+    st.session_state["history_pages"] = 1
+
+
+def start_new_chat():
+    """Empty conversation; it is saved once the first question is asked."""
+    st.session_state["session_id"] = None
+    st.session_state["first_seq"] = 1
+    st.query_params.pop("session", None)
+    reset_view([{"role": "system", "content": SYSTEM_PROMPT}])
+
+
+def open_session(session_id):
+    """Load the system prompt and the last RECENT_MESSAGES messages of a saved chat."""
+    store = get_store()
+    recent, first_seq = store.load_recent(session_id, RECENT_MESSAGES)
+    st.session_state["session_id"] = session_id
+    st.session_state["first_seq"] = first_seq
+    st.query_params["session"] = session_id
+    reset_view([{"role": "system", "content": store.system_prompt(session_id)}] + recent)
+
+
+# --- Initialize session state ---
+if "messages" not in st.session_state:
+    # The chat id is kept in the URL, so a browser refresh reopens the same chat
+    saved = st.query_params.get("session")
+    if saved and get_store().system_prompt(saved) is not None:
+        open_session(saved)
+    else:
+        start_new_chat()
+
+if "context" not in st.session_state:
+    st.session_state["context"] = ContextWindow()
+
+def load_earlier():
+    """Show one more page, fetching older messages from the store once all loaded ones are shown."""
+    state = st.session_state
+    state["history_pages"] += 1
+    if history_window(len(state["messages"]), state["history_pages"]) == 0 and state["first_seq"] > 1:
+        older, state["first_seq"] = get_store().load_before(state["session_id"], state["first_seq"], HISTORY_PAGE_SIZE)
+        state["messages"][1:1] = older
+        state["history_pages"] = len(state["messages"]) // HISTORY_PAGE_SIZE
+
 
 # --- Chat container ---
-chat_container = st.container()
-with chat_container:
-    for msg in st.session_state["messages"]:
+@st.fragment
+def show_history():
+    """Draw the last pages of the conversation; "load earlier" only reruns this fragment."""
+    messages = st.session_state["messages"]
+    start = history_window(len(messages), st.session_state["history_pages"])
+    earlier = sum(1 for msg in messages[:start] if msg["role"] != "system") + st.session_state["first_seq"] - 1
+    if earlier > 0:
+        st.button(
+            f"⬆️ Load earlier messages ({earlier} hidden)",
+            on_click=load_earlier,
+            help=f"Shows {HISTORY_PAGE_SIZE} more messages.",
+        )
+    for msg in messages[start:]:
         if msg["role"] == "user":
             with st.chat_message("user", avatar="👤"):
                 st.markdown(msg["content"])
@@ -55,36 +269,106 @@ with chat_container:
             with st.chat_message("assistant", avatar="🕵🏼"):
                 st.markdown(msg["content"])
 
+
+chat_container = st.container()
+with chat_container:
+    show_history()
+
 # --- User Input (chat-like) ---
 if prompt := st.chat_input("Type your message..."):
-    # Add user input
+    # Add user input, saving the chat on its first question
+    store = get_store()
+    if st.session_state["session_id"] is None:
+        st.session_state["session_id"] = store.create_session(st.session_state["messages"][0]["content"], prompt)
+        st.query_params["session"] = st.session_state["session_id"]
     st.session_state["messages"].append({"role": "user", "content": prompt})
+    store.append(st.session_state["session_id"], "user", prompt)
 
     # Display user message immediately
     with st.chat_message("user", avatar="👤"):
         st.markdown(prompt)
 
-    # Call OpenRouter API
-    client = OpenAI(
-        base_url="https://openrouter.ai/api/v1",
-        api_key=API_KEY,
+    # Send the system prompt plus the recent turns that fit the budget
+    context = st.session_state["context"]
+    request_messages, prompt_tokens, dropped = context.build(
+        st.session_state["messages"], int(context_budget), summarize=summarize_old
     )
-    try:
-        completion = client.chat.completions.create(
-            extra_headers={
-                "HTTP-Referer": SITE_URL,
-                "X-Title": SITE_NAME,
-            },
-            model="qwen/qwen3-4b:free",
-            messages=st.session_state["messages"]
-        )
-        response = completion.choices[0].message.content
-    except Exception as e:
-        response = f"⚠️ Error: {e}"
+    st.caption(format_context(prompt_tokens, context.total(st.session_state["messages"]), dropped))
+
+    # Call OpenRouter API unless this exact request was answered before
+    client = get_client()
+    cache = get_cache()
+    compare = compare_mode and bool(compare_models)
+    cached = cache.get(MODEL, request_messages) if use_cache and not compare else None
+    failed = False
+    if compare:
+        # Each model's answer is looked up and cached separately
+        with st.chat_message("assistant", avatar="🕵🏼"):
+            response = render_comparison(client, request_messages, compare_models, cache if use_cache else None)
+    elif cached is not None:
+        response = cached
+        with st.chat_message("assistant", avatar="🕵🏼"):
+            st.markdown(response)
+            st.caption("⚡ Cached answer")
+    elif stream_replies:
+        # Render tokens into the assistant message as they arrive
+        with st.chat_message("assistant", avatar="🕵🏼"):
+            stats = {}
+            try:
+                response = st.write_stream(stream_completion(client, request_messages, stats))
+                st.caption(format_stats(stats))
+            except Exception as e:
+                response = f"⚠️ Error: {e}"
+                failed = True
+                st.markdown(response)
+    else:
+        try:
+            completion = client.complete(
+                model=MODEL,
+                messages=request_messages
+            )
+            response = completion.choices[0].message.content
+        except Exception as e:
+            response = f"⚠️ Error: {e}"
+            failed = True
+
+        # Display assistant response
+        with st.chat_message("assistant", avatar="🕵🏼"):
+            st.markdown(response)
+
+    if use_cache and not compare and cached is None and not failed:
+        cache.put(MODEL, request_messages, response)
 
     # Add assistant response
     st.session_state["messages"].append({"role": "assistant", "content": response})
+    store.append(st.session_state["session_id"], "assistant", response)
 
-    # Display assistant response
-    with st.chat_message("assistant", avatar="🕵🏼"):
-        st.markdown(response)
+# --- Saved chats (drawn last so they include this turn) ---
+with sessions_panel:
+    st.header("💬 Chats")
+    st.button("➕ New chat", on_click=start_new_chat)
+    for session_id, title, updated, count in get_store().list_sessions(SESSION_LIST_SIZE):
+        current = session_id == st.session_state["session_id"]
+        st.button(
+            f"{'▶️ ' if current else ''}{title}",
+            key=f"session-{session_id}",
+            help=f"{count} messages · last active {time.strftime('%Y-%m-%d %H:%M', time.localtime(updated))}",
+            on_click=open_session,
+            args=(session_id,),
+            disabled=current,
+        )
+
+# --- Cache stats (drawn last so they include this turn) ---
+with cache_panel:
+    info = get_cache().info()
+    st.markdown("**🗄️ Response cache**")
+    col1, col2 = st.columns(2)
+    col1.metric("Hits", info["memory_hits"] + info["disk_hits"])
+    col2.metric("Misses", info["misses"])
+    st.caption(
+        f"Hit rate {info['hit_rate']:.0%} · {info['memory_hits']} memory / {info['disk_hits']} disk hits · "
+        f"{info['memory_entries']} in memory, {info['disk_entries']} on disk"
+    )
+    if st.button("Clear cache"):
+        get_cache().clear()
+        st.rerun()
@@ -0,0 +1,38 @@
+"""Shared setup for the differential tests.
+
+The reference implementations (`edit_distance`, `get_stats`, `merge_vocab`,
+...) live in the Streamlit scripts, which draw their UI at import time.
+`script_functions` loads only a script's imports and plain functions.
+"""
+import ast
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def script_functions(filename):
+    """Namespace with the undecorated top-level functions of a Streamlit script."""
+    with open(os.path.join(ROOT, filename), encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    keep = [
+        node for node in tree.body
+        if (isinstance(node, ast.FunctionDef) and not node.decorator_list)
+        or (isinstance(node, (ast.Import, ast.ImportFrom)) and all(alias.name != "streamlit" for alias in node.names))
+    ]
+    namespace = {}
+    exec(compile(ast.Module(keep, type_ignores=[]), filename, "exec"), namespace)
+    return namespace
+
+
+@pytest.fixture(scope="session")
+def edit_app():
+    return script_functions("minimueditdistance.py")
+
+
+@pytest.fixture(scope="session")
+def bpe_app():
+    return script_functions("Byte-Pair-Encoding-Algo.py")
@@ -0,0 +1,192 @@
+"""bpe.py against the reference `get_stats`/`merge_vocab` loop in the BPE app."""
+import os
+import random
+from collections import Counter
+
+import pytest
+
+from bpe import (
+    BPEEncoder,
+    BPETrainer,
+    count_words,
+    load_model,
+    parallel_count_words,
+    read_chunks,
+    save_model,
+    stream_vocab,
+)
+
+
+def random_text(seed, words=3000, alphabet="abcdeé"):
+    rng = random.Random(seed)
+    vocabulary = ["".join(rng.choice(alphabet) for _ in range(rng.randint(1, 9))) for _ in range(300)]
+    # Zipf-like frequencies, so there are many ties and many distinct counts
+    weights = [1.0 / rank for rank in range(1, len(vocabulary) + 1)]
+    return " ".join(rng.choices(vocabulary, weights, k=words))
+
+
+def reference_merges(app, text, num_merges):
+    """Merges learned by the app's original loop."""
+    vocab = app["get_vocab"](text)
+    merges = []
+    for _ in range(num_merges):
+        pairs = app["get_stats"](vocab)
+        if not pairs:
+            break
+        pair = app["best_pair"](pairs)
+        merges.append(pair)
+        vocab = app["merge_vocab"](pair, vocab)
+    return merges, vocab
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_trainer_matches_reference(bpe_app, seed):
+    text = random_text(seed)
+    expected_merges, expected_vocab = reference_merges(bpe_app, text, 150)
+    trainer = BPETrainer(bpe_app["get_vocab"](text))
+    assert trainer.train(150) == expected_merges
+    assert trainer.vocab == expected_vocab
+
+
+def test_trainer_runs_out_of_pairs_like_reference(bpe_app):
+    text = "low lower lowest"
+    expected_merges, _ = reference_merges(bpe_app, text, 100)
+    assert BPETrainer(bpe_app["get_vocab"](text)).train(100) == expected_merges
+
+
+def test_parallel_pair_stats_match_reference(bpe_app):
+    text = random_text(3)
+    expected_merges, _ = reference_merges(bpe_app, text, 60)
+    assert BPETrainer(bpe_app["get_vocab"](text), workers=2).train(60) == expected_merges
+
+
+def test_top_pairs_match_reference(bpe_app):
+    vocab = bpe_app["get_vocab"](random_text(4))
+    trainer = BPETrainer(vocab)
+    for _ in range(60):
+        pairs = bpe_app["get_stats"](vocab)
+        expected = sorted(pairs.items(), key=lambda item: (-item[1], item[0]))[:10]
+        top = trainer.top_pairs(10)
+        assert top == expected
+        # Drive the merges from top_pairs, as the large-run mode does
+        trainer.merge(top[0][0])
+        vocab = bpe_app["merge_vocab"](top[0][0], vocab)
+    assert trainer.vocab == vocab
+
+
+def test_stream_vocab_matches_get_vocab(bpe_app, tmp_path):
+    text = random_text(5)
+    path = tmp_path / "corpus.txt"
+    path.write_text(text.replace(" ", "\n", 50), encoding="utf-8")
+    vocab, symbols = stream_vocab([str(path)], chunk_size=64)
+    trainer = BPETrainer(vocab, symbols)
+    expected_merges, _ = reference_merges(bpe_app, text, 80)
+    assert trainer.train(80) == expected_merges
+
+
+def trained_encoder(bpe_app, text, num_merges):
+    trainer = BPETrainer(bpe_app["get_vocab"](text))
+    trainer.train(num_merges)
+    return trainer, BPEEncoder.from_trainer(trainer)
+
+
+def test_encoder_matches_trainer_segmentation(bpe_app):
+    text = random_text(6)
+    trainer, encoder = trained_encoder(bpe_app, text, 120)
+    for word, segmented in zip(bpe_app["get_vocab"](text), trainer.vocab):
+        assert encoder.tokenize(word.replace(" ", "")[:-len("</w>")]) == segmented.split()
+
+
+def test_encoder_round_trip_and_unknown_characters(bpe_app):
+    text = random_text(7)
+    _, encoder = trained_encoder(bpe_app, text, 100)
+    sample = random_text(8, words=200, alphabet="abcdeéxyz")
+    ids = encoder.encode(sample)
+    unknown = encoder.symbols.ids["<unk>"]
+    # Characters never seen in training (x, y, z) become <unk>; everything else decodes back.
+    expected = "".join("<unk>" if ch in "xyz" else ch for ch in sample)
+    assert encoder.decode(ids) == " ".join(expected.split())
+    assert (unknown in ids) == any(ch in "xyz" for ch in sample)
+
+
+def test_mapped_encoder_matches_in_memory(bpe_app, tmp_path):
+    text = random_text(9)
+    _, encoder = trained_encoder(bpe_app, text, 200)
+    path = str(tmp_path / "model.bpe")
+    save_model(encoder, path)
+    mapped = load_model(path)
+    assert list(mapped.merges) == list(encoder.merges)
+    sample = random_text(10, words=500, alphabet="abcdeéq")
+    assert mapped.encode(sample) == encoder.encode(sample)
+    assert mapped.decode(mapped.encode(sample)) == encoder.decode(encoder.encode(sample))
+
+
+def test_save_over_mapped_model_keeps_old_encoder(bpe_app, tmp_path):
+    text = random_text(11)
+    _, big = trained_encoder(bpe_app, text, 200)
+    _, small = trained_encoder(bpe_app, text, 5)
+    path = str(tmp_path / "model.bpe")
+    save_model(big, path)
+    mapped = load_model(path)
+    sample = random_text(12, words=300)
+    expected = mapped.encode(sample)
+    save_model(small, path)
+    mapped._encode_word.cache_clear()  # make it read the rank table again
+    assert mapped.encode(sample) == expected
+    assert load_model(path).encode(sample) == small.encode(sample)
+
+
+@pytest.mark.parametrize("keep", [0, 5, 23])
+def test_load_model_rejects_short_file(tmp_path, keep):
+    path = tmp_path / "model.bpe"
+    path.write_bytes((b"BPE1" + bytes(20))[:keep])
+    with pytest.raises(ValueError, match="truncated or corrupt"):
+        load_model(str(path))
+
+
+@pytest.mark.parametrize("cut", [1, 100, 0.5])
+def test_load_model_rejects_truncated_file(bpe_app, tmp_path, cut):
+    _, encoder = trained_encoder(bpe_app, random_text(13), 50)
+    path = tmp_path / "model.bpe"
+    save_model(encoder, str(path))
+    data = path.read_bytes()
+    path.write_bytes(data[:int(len(data) * cut)] if isinstance(cut, float) else data[:-cut])
+    with pytest.raises(ValueError, match="truncated or corrupt"):
+        load_model(str(path))
+
+
+@pytest.mark.parametrize("name", ["../secrets.toml", "a/../../b", "/etc/passwd", "..\\x", "", ".", "link/x"])
+def test_resolve_inside_rejects_escaping_names(bpe_app, tmp_path, name):
+    (tmp_path / "models").mkdir()
+    (tmp_path / "models" / "link").symlink_to(tmp_path)
+    with pytest.raises(ValueError):
+        bpe_app["resolve_inside"](str(tmp_path / "models"), name)
+
+
+def test_resolve_inside_accepts_nested_names(bpe_app, tmp_path):
+    path = bpe_app["resolve_inside"](str(tmp_path), "runs/model.bpe")
+    assert path == str((tmp_path / "runs" / "model.bpe").resolve())
+
+
+def test_corpus_files_lists_visible_files(bpe_app, tmp_path):
+    for name in ["b.txt", "a/c.txt", ".hidden", ".git/config"]:
+        (tmp_path / name).parent.mkdir(exist_ok=True)
+        (tmp_path / name).write_text("x")
+    assert bpe_app["corpus_files"](str(tmp_path)) == [os.path.join("a", "c.txt"), "b.txt"]
+
+
+@pytest.mark.parametrize("workers", [1, 2, 3])
+@pytest.mark.parametrize("chunk_size", [1, 7, 64])
+def test_parallel_count_words_matches_count_words(tmp_path, workers, chunk_size):
+    paths = []
+    for i in range(3):
+        path = tmp_path / f"part{i}.txt"
+        # Mixed separators and multi-byte characters at arbitrary chunk boundaries
+        path.write_text(random_text(20 + i, words=800).replace(" ", " \n\t", 40), encoding="utf-8")
+        paths.append(str(path))
+    expected = Counter()
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            expected.update(f.read().split())
+    assert count_words(read_chunks(paths, chunk_size)) == expected
+    assert parallel_count_words(paths, workers, chunk_size) == expected
@@ -0,0 +1,117 @@
+"""levenshtein.py against the reference `edit_distance` and `linear_search`."""
+import random
+
+import pytest
+
+import levenshtein
+from levenshtein import (
+    DeletionIndex,
+    TrieIndex,
+    bounded_distance,
+    edit_script,
+    levenshtein_distance,
+    linear_search,
+    nearest_matches,
+)
+
+
+def random_string(rng, alphabet="abc", max_len=30):
+    return "".join(rng.choice(alphabet) for _ in range(rng.randint(0, max_len)))
+
+
+def random_pairs(seed, count=500, alphabet="abc", max_len=30):
+    rng = random.Random(seed)
+    return [(random_string(rng, alphabet, max_len), random_string(rng, alphabet, max_len)) for _ in range(count)]
+
+
+def apply_edits(source, edits):
+    """Rebuild the target from `source` and edit rows [operation, char, source position, replacement]."""
+    out = []
+    done = 0  # source characters consumed so far
+    for operation, ch, position, replacement in edits:
+        out.append(source[done:position - 1])
+        if operation == "Insert":
+            out.append(ch)
+            done = position - 1
+        else:
+            assert source[position - 1] == ch
+            if operation == "Replace":
+                out.append(replacement)
+            done = position
+    out.append(source[done:])
+    return "".join(out)
+
+
+@pytest.mark.parametrize("alphabet, max_len", [("ab", 12), ("abc", 30), ("abcdefghij", 70), ("aé😀", 20)])
+def test_levenshtein_distance_matches_reference(edit_app, alphabet, max_len):
+    edit_distance = edit_app["edit_distance"]
+    for source, target in random_pairs(len(alphabet), alphabet=alphabet, max_len=max_len):
+        assert levenshtein_distance(source, target) == edit_distance(source, target)[0]
+
+
+def test_reference_edits_rebuild_target(edit_app):
+    # Checks apply_edits itself, so the edit_script test below means something.
+    for source, target in random_pairs(1, count=200):
+        assert apply_edits(source, edit_app["edit_distance"](source, target)[1]) == target
+
+
+@pytest.mark.parametrize("small_table_cells", [4, levenshtein.SMALL_TABLE_CELLS])
+def test_edit_script_matches_reference(edit_app, monkeypatch, small_table_cells):
+    # A tiny table size forces the Hirschberg split on every subproblem.
+    monkeypatch.setattr(levenshtein, "SMALL_TABLE_CELLS", small_table_cells)
+    for source, target in random_pairs(2, max_len=40):
+        distance, edits = edit_script(source, target)
+        assert distance == edit_app["edit_distance"](source, target)[0]
+        assert apply_edits(source, edits) == target
+
+
+@pytest.mark.parametrize("band_cell_chars", [1, levenshtein.BAND_CELL_CHARS])
+@pytest.mark.parametrize("max_distance", [0, 1, 2, 5])
+def test_bounded_distance_matches_reference(edit_app, monkeypatch, max_distance, band_cell_chars):
+    # BAND_CELL_CHARS = 1 routes levenshtein_distance through the band for most pairs.
+    monkeypatch.setattr(levenshtein, "BAND_CELL_CHARS", band_cell_chars)
+    for source, target in random_pairs(3, max_len=15):
+        expected = edit_app["edit_distance"](source, target)[0]
+        distance, _ = bounded_distance(source, target, max_distance)
+        assert distance == min(expected, max_distance + 1)
+        assert levenshtein_distance(source, target, max_distance) == distance
+
+
+@pytest.mark.parametrize("max_distance", [0, 1, 2, 3])
+def test_trie_search_matches_linear_search(max_distance):
+    rng = random.Random(4)
+    words = [random_string(rng, "abcd", 8) for _ in range(2000)]
+    index = TrieIndex(words)
+    assert len(index) == len(set(words))
+    for _ in range(100):
+        query = random_string(rng, "abcde", 9)
+        assert index.search(query, max_distance) == linear_search(query, set(words), max_distance)
+
+
+@pytest.mark.parametrize("index_distance, max_distance", [(1, 0), (1, 1), (2, 1), (2, 2)])
+def test_deletion_index_matches_linear_search(index_distance, max_distance):
+    rng = random.Random(5)
+    words = [random_string(rng, "abcd", 8) for _ in range(2000)] + ["", "é", "aé😀"]
+    index = DeletionIndex(words, max_distance=index_distance)
+    assert len(index) == len(set(words))
+    for _ in range(100):
+        query = random_string(rng, "abcdeé", 9)
+        assert index.search(query, max_distance) == linear_search(query, set(words), max_distance)
+
+
+def test_deletion_index_rejects_larger_distances():
+    with pytest.raises(ValueError):
+        DeletionIndex(["abc"]).search("abd", 2)
+
+
+@pytest.mark.parametrize("max_distance", [None, 2])
+def test_nearest_matches_skips_duplicate_words(max_distance):
+    rng = random.Random(6)
+    words = [random_string(rng, "abc", 5) for _ in range(300)]
+    query = "abca"
+    *_, (done, matches) = nearest_matches(query, words, k=10, chunk_size=50, max_distance=max_distance)
+    limit = 5 if max_distance is None else max_distance
+    expected = linear_search(query, set(words), limit)[:10]
+    assert done == len(set(words))
+    assert len({word for _, word in matches}) == len(matches)
+    assert matches == expected
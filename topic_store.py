@@ -0,0 +1,258 @@
+"""Storage backends for the 1-4-7 Rule study app.
+
+The app used to keep every topic in `topics.json` and rewrite the whole
+file on each click, which is O(n) I/O per review and unsafe with several
+tabs writing at once. Both backends here expose the same small interface
+(`all`, `by_stage`/`count_stage`, `due`/`count_due`, `add`/`add_many`,
+`set_stage`/`set_stages`) and return topics as dicts with `id`, `name`,
+`stage`, `created_at`, `last_reviewed` and `due_at`. Listings take a name
+filter and an offset/limit page, and the `*_many` calls write a whole
+batch at once:
+
+- `SQLiteTopicStore`: one row per topic with indexes on `stage` and
+  `due_at`; every change is a single-row statement in its own transaction.
+- `JSONTopicStore`: the original whole-file format, kept for compatibility.
+
+`SQLiteTopicStore.migrate_from_json` imports an existing `topics.json` once.
+
+Each topic's `due_at` follows the 1-4-7 rule: a new topic is due at once
+(day 1), then three days after each review (day 4, day 7). Memorized
+topics have no due date. Because `due_at` is indexed, the topics due by a
+given time are an index range scan, O(log n + k), and a review moves only
+the reviewed topic's index entry.
+"""
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+COLUMNS = ("id", "name", "stage", "created_at", "last_reviewed", "due_at")
+
+# Days from the last review until a topic in each stage is due
+REVIEW_DAYS = {"day1": 0, "day4": 3, "day7": 3}
+
+
+def next_due(stage, reviewed_at):
+    """ISO due time for a topic in `stage` last reviewed at `reviewed_at`, or None once memorized."""
+    if stage not in REVIEW_DAYS:
+        return None
+    return (datetime.fromisoformat(reviewed_at) + timedelta(days=REVIEW_DAYS[stage])).isoformat()
+
+
+def _like(query):
+    """LIKE pattern matching `query` anywhere in a name, with wildcards escaped."""
+    return "%" + query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+class SQLiteTopicStore:
+    """Topics in a SQLite table, safe to share between sessions."""
+
+    def __init__(self, path="topics.db"):
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.db.execute("PRAGMA journal_mode=WAL")
+        with self.db:
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS topics ("
+                "id INTEGER PRIMARY KEY, name TEXT NOT NULL, stage TEXT NOT NULL, "
+                "created_at TEXT NOT NULL, last_reviewed TEXT NOT NULL)"
+            )
+            self.db.execute("CREATE INDEX IF NOT EXISTS topics_stage ON topics (stage)")
+            self.db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            columns = {row[1] for row in self.db.execute("PRAGMA table_info(topics)")}
+            if "due_at" not in columns:
+                # Databases created before due dates: add the column and fill it in once
+                self.db.execute("ALTER TABLE topics ADD COLUMN due_at TEXT")
+                rows = self.db.execute("SELECT id, stage, last_reviewed FROM topics").fetchall()
+                self.db.executemany(
+                    "UPDATE topics SET due_at = ? WHERE id = ?",
+                    [(next_due(stage, reviewed), topic_id) for topic_id, stage, reviewed in rows],
+                )
+            self.db.execute("CREATE INDEX IF NOT EXISTS topics_due_at ON topics (due_at)")
+
+    def _select(self, clause="ORDER BY id", params=()):
+        with self.lock:
+            rows = self.db.execute(f"SELECT {', '.join(COLUMNS)} FROM topics {clause}", params).fetchall()
+        return [dict(zip(COLUMNS, row)) for row in rows]
+
+    def _count(self, where, params):
+        with self.lock:
+            return self.db.execute(f"SELECT COUNT(*) FROM topics {where}", params).fetchone()[0]
+
+    @staticmethod
+    def _where(condition, value, query):
+        if query:
+            return f"WHERE {condition} AND name LIKE ? ESCAPE '\\'", (value, _like(query))
+        return f"WHERE {condition}", (value,)
+
+    def all(self):
+        return self._select()
+
+    def by_stage(self, stage, query="", offset=0, limit=-1):
+        """Topics in `stage` whose name contains `query`, oldest first, one page at a time."""
+        where, params = self._where("stage = ?", stage, query)
+        return self._select(f"{where} ORDER BY id LIMIT ? OFFSET ?", params + (limit, offset))
+
+    def count_stage(self, stage, query=""):
+        return self._count(*self._where("stage = ?", stage, query))
+
+    def due(self, until, query="", offset=0, limit=-1):
+        """Topics due at or before `until` (ISO time), earliest first."""
+        where, params = self._where("due_at <= ?", until, query)
+        return self._select(f"{where} ORDER BY due_at LIMIT ? OFFSET ?", params + (limit, offset))
+
+    def count_due(self, until, query=""):
+        return self._count(*self._where("due_at <= ?", until, query))
+
+    def add(self, name, stage, now):
+        due_at = next_due(stage, now)
+        with self.lock, self.db:
+            cursor = self.db.execute(
+                "INSERT INTO topics (name, stage, created_at, last_reviewed, due_at) VALUES (?, ?, ?, ?, ?)",
+                (name, stage, now, now, due_at),
+            )
+        return {
+            "id": cursor.lastrowid, "name": name, "stage": stage,
+            "created_at": now, "last_reviewed": now, "due_at": due_at,
+        }
+
+    def add_many(self, names, stage, now):
+        """Insert many topics in one transaction; returns how many were added."""
+        due_at = next_due(stage, now)
+        with self.lock, self.db:
+            self.db.executemany(
+                "INSERT INTO topics (name, stage, created_at, last_reviewed, due_at) VALUES (?, ?, ?, ?, ?)",
+                [(name, stage, now, now, due_at) for name in names],
+            )
+        return len(names)
+
+    def set_stage(self, topic_id, stage, reviewed_at):
+        self.set_stages([(topic_id, stage)], reviewed_at)
+
+    def set_stages(self, changes, reviewed_at):
+        """Move each (topic_id, stage) in `changes` in a single transaction."""
+        with self.lock, self.db:
+            self.db.executemany(
+                "UPDATE topics SET stage = ?, last_reviewed = ?, due_at = ? WHERE id = ?",
+                [(stage, reviewed_at, next_due(stage, reviewed_at), topic_id) for topic_id, stage in changes],
+            )
+
+    def migrate_from_json(self, path):
+        """Import topics from a legacy JSON file once; returns the number imported."""
+        if not os.path.exists(path):
+            return 0
+        with self.lock:
+            if self.db.execute("SELECT 1 FROM meta WHERE key = 'migrated_from_json'").fetchone():
+                return 0
+        topics = JSONTopicStore(path).all()
+        with self.lock, self.db:
+            self.db.executemany(
+                "INSERT INTO topics (name, stage, created_at, last_reviewed, due_at) VALUES (?, ?, ?, ?, ?)",
+                [(t["name"], t["stage"], t["created_at"], t["last_reviewed"], t["due_at"]) for t in topics],
+            )
+            self.db.execute("INSERT INTO meta VALUES ('migrated_from_json', ?)", (os.path.abspath(path),))
+        return len(topics)
+
+
+class JSONTopicStore:
+    """The original topics.json format: the whole list is rewritten on every change."""
+
+    def __init__(self, path="topics.json"):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, 'r') as f:
+            topics = json.load(f)
+        for i, topic in enumerate(topics, start=1):
+            topic.setdefault("id", i)
+            topic.setdefault("due_at", next_due(topic["stage"], topic["last_reviewed"]))
+        return topics
+
+    def _save(self, topics):
+        with open(self.path, 'w') as f:
+            json.dump(topics, f, indent=4)
+
+    def all(self):
+        with self.lock:
+            return self._load()
+
+    def _filter(self, keep, query):
+        query = query.lower()
+        return [t for t in self.all() if keep(t) and query in t["name"].lower()]
+
+    @staticmethod
+    def _page(topics, offset, limit):
+        return topics[offset:] if limit < 0 else topics[offset:offset + limit]
+
+    def by_stage(self, stage, query="", offset=0, limit=-1):
+        return self._page(self._filter(lambda t: t["stage"] == stage, query), offset, limit)
+
+    def count_stage(self, stage, query=""):
+        return len(self._filter(lambda t: t["stage"] == stage, query))
+
+    def due(self, until, query="", offset=0, limit=-1):
+        topics = self._filter(lambda t: t["due_at"] and t["due_at"] <= until, query)
+        return self._page(sorted(topics, key=lambda t: t["due_at"]), offset, limit)
+
+    def count_due(self, until, query=""):
+        return len(self._filter(lambda t: t["due_at"] and t["due_at"] <= until, query))
+
+    def add(self, name, stage, now):
+        with self.lock:
+            topics = self._load()
+            topic = {
+                "id": max((t["id"] for t in topics), default=0) + 1,
+                "name": name,
+                "stage": stage,
+                "created_at": now,
+                "last_reviewed": now,
+                "due_at": next_due(stage, now),
+            }
+            topics.append(topic)
+            self._save(topics)
+        return topic
+
+    def add_many(self, names, stage, now):
+        with self.lock:
+            topics = self._load()
+            next_id = max((t["id"] for t in topics), default=0) + 1
+            for i, name in enumerate(names):
+                topics.append({
+                    "id": next_id + i,
+                    "name": name,
+                    "stage": stage,
+                    "created_at": now,
+                    "last_reviewed": now,
+                    "due_at": next_due(stage, now),
+                })
+            self._save(topics)
+        return len(names)
+
+    def set_stage(self, topic_id, stage, reviewed_at):
+        self.set_stages([(topic_id, stage)], reviewed_at)
+
+    def set_stages(self, changes, reviewed_at):
+        new_stage = dict(changes)
+        with self.lock:
+            topics = self._load()
+            for topic in topics:
+                if topic["id"] in new_stage:
+                    topic["stage"] = new_stage[topic["id"]]
+                    topic["last_reviewed"] = reviewed_at
+                    topic["due_at"] = next_due(topic["stage"], reviewed_at)
+            self._save(topics)
+
+
+def open_store(backend="sqlite", path=None, legacy_json="topics.json"):
+    """Open a topic store; the SQLite store imports `legacy_json` the first time."""
+    if backend == "json":
+        return JSONTopicStore(path or legacy_json)
+    if backend == "sqlite":
+        store = SQLiteTopicStore(path or "topics.db")
+        store.migrate_from_json(legacy_json)
+        return store
+    raise ValueError(f"Unknown topic store backend: {backend}")
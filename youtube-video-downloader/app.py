@@ -6,6 +6,17 @@ import re
 from pathlib import Path
 import time
 from datetime import datetime
+from download_jobs import ACTIVE_STATES, DownloadManager, ProgressThrottle, download, progress_fraction
+from format_planner import available_heights, has_audio, plan_download
+from video_cache import MetadataCache
+
+# Metadata cache settings; set YTDL_METADATA_CACHE_DIR to also keep entries on disk
+METADATA_TTL = 30 * 60  # seconds; stream URLs in the info expire after a few hours
+METADATA_CACHE_SIZE = 128  # videos kept in memory
+METADATA_DISK_DIR = os.environ.get('YTDL_METADATA_CACHE_DIR')
+# Background downloads shared by every session
+DOWNLOAD_WORKERS = 2
+POLL_INTERVAL = 1.0  # seconds between progress refreshes while jobs run
 
 # Page configuration
 st.set_page_config(
@@ -95,58 +106,65 @@ def validate_youtube_url(url):
     )
     return youtube_regex.match(url) is not None
 
-def get_video_info(url):
-    """Get video information without downloading"""
+@st.cache_resource
+def get_metadata_cache():
+    """One metadata cache per process, shared by every session"""
+    return MetadataCache(ttl=METADATA_TTL, max_items=METADATA_CACHE_SIZE, disk_dir=METADATA_DISK_DIR)
+
+def fetch_video_info(url):
+    """Extract video information from YouTube (one network round trip)"""
     ydl_opts = {
         'quiet': True,
         'no_warnings': True,
     }
     
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        info = ydl.extract_info(url, download=False)
+        # Plain JSON types, so the info can also be cached on disk
+        return ydl.sanitize_info(info)
+
+@st.cache_resource
+def get_download_manager():
+    """One download queue and worker pool per process"""
+    return DownloadManager(max_workers=DOWNLOAD_WORKERS)
+
+def get_video_info(url):
+    """Get video information without downloading, from the cache when possible"""
     try:
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=False)
-            return info
+        return get_metadata_cache().get(url, fetch_video_info)
     except Exception as e:
         st.error(f"Error getting video info: {str(e)}")
         return None
 
 def get_available_qualities(info):
-    """Extract available video qualities with audio support"""
+    """Available video qualities, each with the concrete format ids that will be downloaded"""
     qualities = []
     formats = info.get('formats', [])
     
-    # Get all unique video qualities from available formats
-    video_qualities = set()
-    for fmt in formats:
-        vcodec = fmt.get('vcodec', 'none')
-        if vcodec != 'none':
-            quality = fmt.get('format_note', '')
-            if quality:
-                video_qualities.add(quality)
-    
-    # Create quality options based on available video qualities
-    quality_order = ['2160p', '1440p', '1080p', '720p', '480p', '360p', '240p', '144p']
-    
-    for quality in quality_order:
-        if quality in video_qualities:
-            # Estimate file size (we'll use a placeholder since exact size depends on format selection)
-            estimated_size = estimate_file_size(quality)
-            qualities.append({
-                'quality': quality,
-                'resolution': quality,
-                'filesize': estimated_size,
-                'format_id': quality,  # We'll use the quality name for format selection
-                'has_audio': True,  # We'll ensure audio in download function
-                'has_video': True
-            })
+    # One option per distinct video height, planned from the real format list
+    for height in available_heights(formats):
+        plan = plan_download(formats, height)
+        video = plan['video']
+        quality = f"{height}p"
+        qualities.append({
+            'quality': quality,
+            'resolution': f"{video['width']}x{height}" if video.get('width') else quality,
+            # Sizes reported by YouTube, or a rough estimate when they are missing
+            'filesize': plan['filesize'] or estimate_file_size(quality),
+            'format_id': plan['format_id'],
+            'container': plan['container'],
+            'has_audio': plan['audio'] is not None or has_audio(video),
+            'has_video': True
+        })
     
-    # If no standard qualities found, add a generic "Best Available" option
+    # If no video formats were found, add a generic "Best Available" option
     if not qualities:
         qualities.append({
             'quality': 'Best Available',
             'resolution': 'Variable',
             'filesize': 0,
             'format_id': 'best',
+            'container': 'mp4',
             'has_audio': True,
             'has_video': True
         })
@@ -178,99 +196,129 @@ def format_file_size(size_bytes):
         size_bytes /= 1024.0
     return f"{size_bytes:.1f} TB"
 
-def download_video(url, quality, download_path):
-    """Download video with specified quality and audio"""
-    # Create a more robust format selection with fallbacks
-    quality_height = quality.replace('p', '')
-    
-    # Try multiple format selection strategies in order of preference
-    format_strategies = [
-        # Strategy 1: Best video + best audio for specific quality
-        f"bestvideo[height<={quality_height}]+bestaudio/best[height<={quality_height}]",
-        # Strategy 2: Best video + best audio (any quality)
-        "bestvideo+bestaudio/best",
-        # Strategy 3: Best combined format
-        "best",
-        # Strategy 4: Any format with video and audio
-        "best[ext=mp4]/best[ext=webm]/best",
-        # Strategy 5: Most basic fallback - any available format
-        "worst"
-    ]
-    
-    ydl_opts = {
-        'outtmpl': os.path.join(download_path, '%(title)s.%(ext)s'),
-        'progress_hooks': [lambda d: update_progress(d)],
-        'merge_output_format': 'mp4',  # Merge video and audio into mp4
-        'postprocessors': [{
-            'key': 'FFmpegVideoConvertor',
-            'preferedformat': 'mp4',
-        }],
-        'writesubtitles': False,
-        'writeautomaticsub': False,
-        'ignoreerrors': False,
-    }
+def download_video(url, format_id, download_path, info=None, container='mp4', progress_hook=None):
+    """Download the planned `format_id` (e.g. "137+140") in a single attempt
+
+    `info` from get_video_info is reused instead of extracting it again, and
+    `container` is the format the planned streams merge into by stream copy.
+    `progress_hook` gets yt-dlp's progress callbacks (see make_progress_hook).
+    """
+    try:
+        refreshed = download(
+            url,
+            format_id,
+            download_path,
+            info=info,
+            container=container,
+            progress_hooks=[progress_hook] if progress_hook else [],
+        )
+        if refreshed:
+            st.info("The cached stream links had expired, so the video was downloaded again with fresh ones.")
+        return True
+    except Exception as e:
+        st.error(f"Download failed: {str(e)}")
     
-    # Try each format strategy until one works
-    for i, format_selector in enumerate(format_strategies):
-        ydl_opts['format'] = format_selector
+    # Show the formats the plan was made from, for debugging
+    formats = info.get('formats', []) if info else []
+    if formats:
+        st.info(f"Planned format: {format_id}. Available formats for debugging:")
+        format_list = []
+        for fmt in formats[:10]:  # Show first 10 formats
+            vcodec = fmt.get('vcodec', 'none')
+            acodec = fmt.get('acodec', 'none')
+            quality = fmt.get('format_note', 'Unknown')
+            fmt_id = fmt.get('format_id', 'Unknown')
+            format_list.append(f"ID: {fmt_id} | Quality: {quality} | Video: {vcodec} | Audio: {acodec}")
         
-        try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                ydl.download([url])
-            
-            # If we get here, download was successful
-            if i > 0:
-                st.info(f"Downloaded using fallback format strategy {i+1}")
-            return True
-            
-        except Exception as e:
-            error_msg = str(e)
-            if "Requested format is not available" in error_msg:
-                # Try next strategy
-                continue
-            else:
-                # Different error, show it
-                st.error(f"Download failed: {error_msg}")
-                return False
+        st.text("\n".join(format_list))
     
-    # If all strategies failed, show available formats for debugging
-    st.error("All format selection strategies failed. The video might be unavailable or restricted.")
+    return False
+
+def format_eta(seconds):
+    """Seconds as m:ss (or h:mm:ss)"""
+    if seconds is None:
+        return "--:--"
+    minutes, secs = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{secs:02d}" if hours else f"{minutes}:{secs:02d}"
+
+def progress_text(d):
+    """Percent, bytes, speed and ETA (or fragments) for one yt-dlp progress callback"""
+    parts = []
+    fraction = progress_fraction(d)
+    if fraction is not None:
+        parts.append(f"{fraction:.1%}")
+    total = d.get('total_bytes') or d.get('total_bytes_estimate')
+    if total:
+        parts.append(f"{format_file_size(d.get('downloaded_bytes') or 0)} of {format_file_size(total)}")
+    elif d.get('downloaded_bytes'):
+        parts.append(format_file_size(d['downloaded_bytes']))
+    if d.get('fragment_count'):
+        parts.append(f"fragment {d.get('fragment_index') or 0}/{d['fragment_count']}")
+    if d.get('speed'):
+        parts.append(f"{format_file_size(d['speed'])}/s")
+    parts.append(f"ETA {format_eta(d.get('eta'))}")
+    return " · ".join(parts)
+
+def make_progress_hook(progress_bar, status_text):
+    """yt-dlp progress hook that redraws the existing `progress_bar` and `status_text`
+
+    Callbacks arrive many times a second on a fast connection; the throttle
+    lets one redraw through every 250 ms or 1%, and no new elements are added.
+    """
+    throttle = ProgressThrottle()
     
-    # Show available formats for debugging
-    try:
-        with yt_dlp.YoutubeDL({'quiet': True, 'no_warnings': True}) as ydl:
-            info = ydl.extract_info(url, download=False)
-            formats = info.get('formats', [])
-            
-            if formats:
-                st.info("Available formats for debugging:")
-                format_list = []
-                for fmt in formats[:10]:  # Show first 10 formats
-                    vcodec = fmt.get('vcodec', 'none')
-                    acodec = fmt.get('acodec', 'none')
-                    quality = fmt.get('format_note', 'Unknown')
-                    format_id = fmt.get('format_id', 'Unknown')
-                    format_list.append(f"ID: {format_id} | Quality: {quality} | Video: {vcodec} | Audio: {acodec}")
-                
-                st.text("\n".join(format_list))
-    except:
-        pass
+    def hook(d):
+        if d['status'] == 'downloading':
+            fraction = progress_fraction(d)
+            if throttle.ready(fraction):
+                if fraction is not None:
+                    progress_bar.progress(fraction)
+                status_text.text(f"Downloading: {progress_text(d)}")
+        elif d['status'] == 'finished':
+            # One stream is done; the next stream or the merge follows
+            progress_bar.progress(1.0)
+            status_text.text(f"Downloaded {os.path.basename(d.get('filename', ''))}, processing...")
+            throttle.reset()
     
-    return False
+    return hook
 
-def update_progress(d):
-    """Update download progress"""
-    if d['status'] == 'downloading':
-        if 'total_bytes' in d:
-            percent = d['downloaded_bytes'] / d['total_bytes'] * 100
-            st.progress(percent / 100)
-        elif '_percent_str' in d:
-            percent_str = d['_percent_str'].replace('%', '')
-            try:
-                percent = float(percent_str) / 100
-                st.progress(percent)
-            except:
-                pass
+def show_downloads(polling):
+    """This session's background downloads; reruns on its own every POLL_INTERVAL while jobs are active"""
+    manager = get_download_manager()
+    jobs = manager.snapshot(st.session_state.get('download_jobs', []))
+    if not jobs:
+        return
+    
+    st.subheader("📥 Downloads")
+    counts = manager.counts()
+    running = counts.get('downloading', 0) + counts.get('processing', 0)
+    st.caption(f"Shared queue: {running} running, {counts.get('queued', 0)} waiting, {DOWNLOAD_WORKERS} workers")
+    
+    status_icons = {
+        'queued': '⏳', 'downloading': '⬇️', 'processing': '⚙️',
+        'finished': '✅', 'error': '❌', 'cancelled': '🚫',
+    }
+    for job in jobs:
+        label = f"{status_icons[job['status']]} {job['title']} ({job['quality']}) - {job['status']}"
+        st.progress(job['fraction'], text=label)
+        if job['status'] == 'downloading' and job['total_bytes']:
+            speed = f"{format_file_size(job['speed'])}/s" if job['speed'] else "--"
+            st.caption(
+                f"{format_file_size(job['downloaded_bytes'])} of {format_file_size(job['total_bytes'])} · "
+                f"{speed} · ETA {format_eta(job['eta'])}"
+            )
+        elif job['status'] == 'finished':
+            note = " (stream links had expired and were refreshed)" if job['refreshed'] else ""
+            st.caption(f"Saved to {job['download_path']}{note}")
+        elif job['status'] == 'error':
+            st.error(f"Download failed: {job['error']}")
+        if job['status'] in ('queued', 'downloading'):
+            st.button("Cancel", key=f"cancel_{job['id']}", on_click=manager.cancel, args=(job['id'],))
+    
+    if polling and not any(job['status'] in ACTIVE_STATES for job in jobs):
+        # Everything finished: rerun the whole app once so polling stops
+        st.rerun()
 
 def main():
     # Beautiful Color Grid Header
@@ -342,6 +390,15 @@ def main():
                 st.success(f"✅ Created directory: {download_path}")
             except Exception as e:
                 st.error(f"❌ Error creating directory: {str(e)}")
+        
+        background = st.toggle(
+            "Download in background",
+            value=True,
+            help="Queue downloads on the shared worker pool so they keep running across reruns"
+        )
+        
+        # Filled in at the end of main() so the numbers include this run
+        cache_panel = st.container()
     
     # Main content area
     col1, col2 = st.columns([2, 1])
@@ -399,48 +456,75 @@ def main():
                         if selected_quality:
                             # Extract quality from selection (remove emoji and get quality name)
                             selected_quality_name = selected_quality.split(' (')[0].replace('🎵 ', '').replace('🔇 ', '')
-                            selected_format_id = next(q['format_id'] for q in qualities if q['quality'] == selected_quality_name)
+                            selected = next(q for q in qualities if q['quality'] == selected_quality_name)
                             
                             # Download button
                             if st.button("🚀 Download Video", type="primary"):
-                                st.markdown("</div>", unsafe_allow_html=True)
-                                
-                                # Download progress
-                                st.subheader("📥 Download Progress")
-                                progress_bar = st.progress(0)
-                                status_text = st.empty()
-                                
-                                status_text.text("Starting download...")
-                                
-                                # Start download
-                                success = download_video(url, selected_format_id, download_path)
-                                
-                                if success:
-                                    progress_bar.progress(100)
-                                    status_text.text("✅ Download completed successfully!")
+                                if background:
+                                    job_id = get_download_manager().submit(
+                                        url,
+                                        video_info.get('title', 'Unknown'),
+                                        selected['format_id'],
+                                        selected['quality'],
+                                        download_path,
+                                        info=video_info,
+                                        container=selected['container'],
+                                    )
+                                    st.session_state.setdefault('download_jobs', []).append(job_id)
+                                    st.toast(f"Queued {selected['quality']} download")
+                                else:
+                                    st.markdown("</div>", unsafe_allow_html=True)
                                     
-                                    st.markdown("""
-                                    <div class="success-message">
-                                        <h4>🎉 Download Complete!</h4>
-                                        <p>Your video has been saved to: <strong>{}</strong></p>
-                                    </div>
-                                    """.format(download_path), unsafe_allow_html=True)
+                                    # Download progress
+                                    st.subheader("📥 Download Progress")
+                                    progress_bar = st.progress(0)
+                                    status_text = st.empty()
                                     
-                                    # Show download info
-                                    st.balloons()
-                                else:
-                                    st.markdown("""
-                                    <div class="error-message">
-                                        <h4>❌ Download Failed</h4>
-                                        <p>Please check the URL and try again.</p>
-                                    </div>
-                                    """, unsafe_allow_html=True)
+                                    status_text.text("Starting download...")
+                                    
+                                    # Start download
+                                    success = download_video(
+                                        url,
+                                        selected['format_id'],
+                                        download_path,
+                                        info=video_info,
+                                        container=selected['container'],
+                                        progress_hook=make_progress_hook(progress_bar, status_text),
+                                    )
+                                    
+                                    if success:
+                                        progress_bar.progress(100)
+                                        status_text.text("✅ Download completed successfully!")
+                                        
+                                        st.markdown("""
+                                        <div class="success-message">
+                                            <h4>🎉 Download Complete!</h4>
+                                            <p>Your video has been saved to: <strong>{}</strong></p>
+                                        </div>
+                                        """.format(download_path), unsafe_allow_html=True)
+                                        
+                                        # Show download info
+                                        st.balloons()
+                                    else:
+                                        st.markdown("""
+                                        <div class="error-message">
+                                            <h4>❌ Download Failed</h4>
+                                            <p>Please check the URL and try again.</p>
+                                        </div>
+                                        """, unsafe_allow_html=True)
                     else:
                         st.warning("No video formats available for this URL")
             else:
                 st.error("❌ Please enter a valid YouTube URL")
         
         st.markdown('</div>', unsafe_allow_html=True)
+        
+        # Background jobs, refreshed by polling only while some are still active
+        active = any(
+            job['status'] in ACTIVE_STATES
+            for job in get_download_manager().snapshot(st.session_state.get('download_jobs', []))
+        )
+        st.fragment(show_downloads, run_every=POLL_INTERVAL if active else None)(active)
     
     with col2:
         st.markdown("""
@@ -473,6 +557,20 @@ def main():
             </p>
         </div>
         """, unsafe_allow_html=True)
+    
+    with cache_panel:
+        stats = get_metadata_cache().info()
+        st.subheader("🗄️ Metadata Cache")
+        col_hits, col_misses = st.columns(2)
+        col_hits.metric("Hits", stats['memory_hits'] + stats['disk_hits'])
+        col_misses.metric("Misses", stats['misses'])
+        st.caption(
+            f"Hit rate {stats['hit_rate']:.0%} · ~{stats['saved_seconds']:.1f}s of lookups saved · "
+            f"{stats['entries']} videos cached" + (" · disk tier on" if METADATA_DISK_DIR else "")
+        )
+        if st.button("Clear metadata cache"):
+            get_metadata_cache().clear()
+            st.rerun()
 
 if __name__ == "__main__":
     main()
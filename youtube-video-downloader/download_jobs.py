@@ -0,0 +1,281 @@
+"""
+Background download jobs for the YouTube downloader.
+
+Running a download inline froze the Streamlit session until it finished,
+allowed one download at a time and was killed by navigating away.
+`DownloadManager` is created once per process (the app keeps it in
+`st.cache_resource`) and runs jobs on a bounded thread pool. Each job's
+status, progress, speed and ETA are updated from yt-dlp's progress hook,
+and the UI polls them, so downloads survive reruns and every session shares
+one scheduler.
+
+`progress_fraction` and `ProgressThrottle` are shared with the inline
+download in the app, which redraws one progress bar at most every 250 ms or
+1% instead of once per progress callback.
+"""
+
+import copy
+import os
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import yt_dlp
+from yt_dlp.networking.exceptions import HTTPError
+
+ACTIVE_STATES = ('queued', 'downloading', 'processing')
+# Cached info younger than this has live stream URLs, so an HTTP 403/410 is a real error
+STREAM_URL_MIN_AGE = 600
+
+
+def progress_fraction(d):
+    """Fraction done from a yt-dlp progress dict, or None if it cannot be told
+
+    Fragmented (DASH/HLS) downloads often have no byte total, so fall back to
+    `fragment_index` / `fragment_count`.
+    """
+    total = d.get('total_bytes') or d.get('total_bytes_estimate')
+    if total:
+        return min(1.0, (d.get('downloaded_bytes') or 0) / total)
+    if d.get('fragment_count'):
+        return min(1.0, (d.get('fragment_index') or 0) / d['fragment_count'])
+    return None
+
+
+class ProgressThrottle:
+    """Lets a progress update through every `interval` seconds, or sooner once it moved by `min_step`"""
+
+    def __init__(self, interval=0.25, min_step=0.01):
+        self.interval = interval
+        self.min_step = min_step
+        self.last_time = None
+        self.last_fraction = None
+
+    def ready(self, fraction):
+        now = time.monotonic()
+        moved = (
+            fraction is not None and self.last_fraction is not None
+            and abs(fraction - self.last_fraction) >= self.min_step
+        )
+        if self.last_time is not None and now - self.last_time < self.interval and not moved:
+            return False
+        self.last_time = now
+        if fraction is not None:
+            self.last_fraction = fraction
+        return True
+
+    def reset(self):
+        """Let the next update through, e.g. when the next stream starts"""
+        self.last_time = None
+        self.last_fraction = None
+
+
+def stream_urls_expired(error, info):
+    """Whether a DownloadError looks like the signed stream URLs in aged `info` ran out"""
+    if time.time() - info.get('epoch', time.time()) < STREAM_URL_MIN_AGE:
+        return False
+    cause = error.exc_info[1] if error.exc_info else None
+    if isinstance(cause, HTTPError):
+        return cause.status in (403, 410)
+    return re.search(r'HTTP Error (403|410)', str(error)) is not None
+
+
+def run_download(ydl, url, info):
+    """Download from already extracted info; returns True if it had to re-extract
+
+    Any failure is raised as is, except an HTTP 403/410 on info older than
+    STREAM_URL_MIN_AGE: those are expired stream URLs, so the info is
+    extracted again and the download retried once.
+    """
+    if info is None:
+        ydl.download([url])
+        return False
+    try:
+        # process_ie_result fills in fields on the dict, so keep the cached copy untouched
+        ydl.process_ie_result(copy.deepcopy(info), download=True)
+    except yt_dlp.utils.DownloadError as e:
+        if not stream_urls_expired(e, info):
+            raise
+        ydl.download([url])
+        return True
+    return False
+
+
+def download(url, format_id, download_path, info=None, container='mp4', progress_hooks=()):
+    """Download the planned `format_id` (e.g. "137+140") in a single attempt; raises on failure
+
+    Returns True if the stream URLs in `info` had expired and the download
+    ran again with freshly extracted ones (see run_download).
+    """
+    ydl_opts = {
+        'format': format_id,
+        'outtmpl': os.path.join(download_path, '%(title)s.%(ext)s'),
+        'progress_hooks': list(progress_hooks),
+        'merge_output_format': container,
+        # Copy the streams into mp4 when needed; never re-encode
+        'postprocessors': [{
+            'key': 'FFmpegVideoRemuxer',
+            'preferedformat': 'mp4',
+        }],
+        'writesubtitles': False,
+        'writeautomaticsub': False,
+        'ignoreerrors': False,
+        'quiet': True,
+        'noprogress': True,
+    }
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        return run_download(ydl, url, info)
+
+
+class DownloadJob:
+    """State of one download; written by a worker thread, read by the UI"""
+
+    def __init__(self, url, title, format_id, quality, download_path, info, container):
+        self.id = uuid.uuid4().hex[:8]
+        self.url = url
+        self.title = title
+        self.format_id = format_id
+        self.quality = quality
+        self.download_path = download_path
+        self.info = info
+        self.container = container
+        self.status = 'queued'
+        self.downloaded_bytes = 0
+        self.total_bytes = 0
+        self.progress = 0.0
+        self.speed = None
+        self.eta = None
+        self.filename = None
+        self.error = None
+        self.refreshed = False
+        self.cancel_requested = False
+        self.created_at = time.time()
+        self.finished_at = None
+
+    @property
+    def active(self):
+        return self.status in ACTIVE_STATES
+
+    @property
+    def fraction(self):
+        if self.status == 'finished':
+            return 1.0
+        return self.progress
+
+    def snapshot(self):
+        """Plain copy of the fields the UI shows, taken under the manager's lock"""
+        return {
+            'id': self.id,
+            'title': self.title,
+            'quality': self.quality,
+            'status': self.status,
+            'downloaded_bytes': self.downloaded_bytes,
+            'total_bytes': self.total_bytes,
+            'fraction': self.fraction,
+            'speed': self.speed,
+            'eta': self.eta,
+            'filename': self.filename,
+            'error': self.error,
+            'refreshed': self.refreshed,
+            'download_path': self.download_path,
+        }
+
+
+class DownloadManager:
+    """Process-wide queue of download jobs run by a bounded worker pool"""
+
+    def __init__(self, max_workers=2, keep_finished=100):
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='download')
+        self.lock = threading.Lock()
+        self.jobs = {}
+        self.keep_finished = keep_finished
+
+    def submit(self, url, title, format_id, quality, download_path, info=None, container='mp4'):
+        """Queue a download; returns the job id"""
+        job = DownloadJob(url, title, format_id, quality, download_path, info, container)
+        with self.lock:
+            self.jobs[job.id] = job
+            self._prune()
+        self.pool.submit(self._run, job)
+        return job.id
+
+    def cancel(self, job_id):
+        """Stop a job at its next progress update (or before it starts)"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is not None and job.active:
+                job.cancel_requested = True
+
+    def snapshot(self, job_ids=None):
+        """Job states, newest first; all jobs or only `job_ids`"""
+        with self.lock:
+            jobs = self.jobs.values() if job_ids is None else [self.jobs[i] for i in job_ids if i in self.jobs]
+            return [job.snapshot() for job in sorted(jobs, key=lambda job: job.created_at, reverse=True)]
+
+    def counts(self):
+        """Number of jobs in each status across all sessions"""
+        with self.lock:
+            counts = {}
+            for job in self.jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            return counts
+
+    def _prune(self):
+        done = sorted((job for job in self.jobs.values() if not job.active), key=lambda job: job.finished_at)
+        for job in done[:max(0, len(done) - self.keep_finished)]:
+            del self.jobs[job.id]
+
+    def _hook(self, job, d):
+        with self.lock:
+            if job.cancel_requested:
+                raise yt_dlp.utils.DownloadCancelled('Cancelled by user')
+            if d['status'] == 'downloading':
+                job.status = 'downloading'
+                job.downloaded_bytes = d.get('downloaded_bytes') or 0
+                job.total_bytes = d.get('total_bytes') or d.get('total_bytes_estimate') or 0
+                fraction = progress_fraction(d)
+                if fraction is not None:
+                    job.progress = fraction
+                job.speed = d.get('speed')
+                job.eta = d.get('eta')
+                job.filename = d.get('filename')
+            elif d['status'] == 'finished':
+                # One stream is done; merging or the next stream follows
+                job.status = 'processing'
+                job.downloaded_bytes = job.total_bytes = d.get('total_bytes') or job.downloaded_bytes
+                job.progress = 1.0
+
+    def _finish(self, job, status, error=None):
+        with self.lock:
+            job.status = status
+            job.error = error
+            job.info = None  # the metadata cache still has it
+            job.finished_at = time.time()
+
+    def _run(self, job):
+        with self.lock:
+            if job.cancel_requested:
+                cancelled = True
+            else:
+                cancelled = False
+                job.status = 'downloading'
+        if cancelled:
+            self._finish(job, 'cancelled')
+            return
+        try:
+            job.refreshed = download(
+                job.url,
+                job.format_id,
+                job.download_path,
+                info=job.info,
+                container=job.container,
+                progress_hooks=[lambda d: self._hook(job, d)],
+            )
+        except yt_dlp.utils.DownloadCancelled:
+            self._finish(job, 'cancelled')
+        except Exception as e:
+            self._finish(job, 'cancelled' if job.cancel_requested else 'error', str(e))
+        else:
+            self._finish(job, 'finished')
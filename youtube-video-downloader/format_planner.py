@@ -0,0 +1,110 @@
+"""
+Format planning for the YouTube downloader.
+
+Instead of trying format selector strings until one works, pick concrete
+format ids from the `formats` list that `extract_info` already returned:
+
+- the best video stream at or below the requested height,
+- the best audio stream in a container that merges with that video by
+  stream copy (mp4 video + m4a audio, webm video + webm audio),
+- or a single format that already has both.
+
+The plan is then downloaded in one attempt with a format spec like
+"137+140".
+"""
+
+# Containers that can be merged with a plain stream copy
+MERGE_CONTAINER = {
+    ('mp4', 'm4a'): 'mp4',
+    ('mp4', 'mp4'): 'mp4',
+    ('webm', 'webm'): 'webm',
+}
+# Video codecs that ffmpeg copies into mp4 without trouble, best first
+CODEC_PREFERENCE = ('avc1', 'h264', 'av01', 'vp09', 'vp9')
+
+
+def has_video(fmt):
+    return fmt.get('vcodec') not in (None, 'none') and bool(fmt.get('height'))
+
+
+def has_audio(fmt):
+    return fmt.get('acodec') not in (None, 'none')
+
+
+def stream_size(fmt):
+    return fmt.get('filesize') or fmt.get('filesize_approx') or 0
+
+
+def codec_rank(fmt):
+    codec = (fmt.get('vcodec') or '').lower()
+    for rank, prefix in enumerate(CODEC_PREFERENCE):
+        if codec.startswith(prefix):
+            return len(CODEC_PREFERENCE) - rank
+    return 0
+
+
+def available_heights(formats):
+    """Distinct video heights, highest first"""
+    return sorted({fmt['height'] for fmt in formats if has_video(fmt)}, reverse=True)
+
+
+def pick_audio(formats, video_ext):
+    """Best audio-only stream, preferring one that merges with `video_ext` by stream copy"""
+    audio = [fmt for fmt in formats if has_audio(fmt) and not has_video(fmt)]
+    if not audio:
+        return None
+    return max(audio, key=lambda fmt: (
+        (video_ext, fmt.get('ext')) in MERGE_CONTAINER,
+        fmt.get('abr') or fmt.get('tbr') or 0,
+    ))
+
+
+def plan_download(formats, max_height=None):
+    """Concrete formats for the best download at or below `max_height`
+
+    Returns a dict with the yt-dlp `format_id` spec ("137+140" or "18"), the
+    chosen `video` and `audio` format dicts (audio is None for a single
+    combined format), the `height`, the merge `container` and the estimated
+    `filesize`, or None if there is no video stream at all.
+    """
+    heights = available_heights(formats)
+    if not heights:
+        return None
+    fitting = [h for h in heights if max_height is None or h <= max_height]
+    height = fitting[0] if fitting else heights[-1]
+
+    candidates = [fmt for fmt in formats if has_video(fmt) and fmt['height'] == height]
+    video_only = [fmt for fmt in candidates if not has_audio(fmt)]
+    combined = [fmt for fmt in candidates if has_audio(fmt)]
+
+    if video_only:
+        def video_key(fmt):
+            audio = pick_audio(formats, fmt.get('ext'))
+            merges = audio is not None and (fmt.get('ext'), audio.get('ext')) in MERGE_CONTAINER
+            return (merges, codec_rank(fmt), fmt.get('fps') or 0, fmt.get('tbr') or 0)
+
+        video = max(video_only, key=video_key)
+        audio = pick_audio(formats, video.get('ext'))
+        if audio is not None:
+            container = MERGE_CONTAINER.get((video.get('ext'), audio.get('ext')), 'mkv')
+            return {
+                'format_id': f"{video['format_id']}+{audio['format_id']}",
+                'video': video,
+                'audio': audio,
+                'height': height,
+                'container': container,
+                'filesize': stream_size(video) + stream_size(audio),
+            }
+        if not combined:
+            # No audio stream anywhere: video only is the best there is
+            combined = [video]
+
+    best = max(combined, key=lambda fmt: (codec_rank(fmt), fmt.get('tbr') or 0))
+    return {
+        'format_id': best['format_id'],
+        'video': best,
+        'audio': None,
+        'height': height,
+        'container': best.get('ext') or 'mp4',
+        'filesize': stream_size(best),
+    }
@@ -0,0 +1,155 @@
+"""
+Video metadata cache for the YouTube downloader.
+
+Every Streamlit rerun (changing the quality, clicking Download) used to call
+`extract_info` again for the same URL. `MetadataCache` keeps the extracted
+info per video id:
+
+- in memory, as an LRU bounded to `max_items` entries,
+- optionally on disk, one JSON file per video, so restarts stay warm;
+  the oldest files are removed beyond `disk_items`.
+
+Entries expire after `ttl` seconds. YouTube stream URLs inside the info are
+signed and stop working after a few hours, so the TTL should stay well
+below that.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+VIDEO_ID_REGEX = re.compile(r'(?:v=|/embed/|/v/|/shorts/|youtu\.be/)([0-9A-Za-z_-]{11})')
+
+
+def video_id(url):
+    """The 11-character video id, so different URL forms share one cache entry"""
+    match = VIDEO_ID_REGEX.search(url)
+    return match.group(1) if match else url.strip()
+
+
+class MetadataCache:
+    """Thread-safe TTL + LRU cache of `extract_info` results"""
+
+    def __init__(self, ttl=1800, max_items=128, disk_dir=None, disk_items=1000):
+        self.ttl = ttl
+        self.max_items = max_items
+        self.disk_dir = disk_dir
+        self.disk_items = disk_items
+        self.entries = OrderedDict()  # video id -> (fetched_at, fetch_seconds, info)
+        self.lock = threading.Lock()
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'saved_seconds': 0.0}
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def get(self, url, fetch):
+        """Cached info for `url`, calling `fetch(url)` on a miss"""
+        key = video_id(url)
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and now - entry[0] <= self.ttl:
+                self.entries.move_to_end(key)
+                self.stats['memory_hits'] += 1
+                self.stats['saved_seconds'] += entry[1]
+                return entry[2]
+
+        entry = self._read_disk(key, now)
+        if entry is not None:
+            with self.lock:
+                self._remember(key, entry)
+                self.stats['disk_hits'] += 1
+                self.stats['saved_seconds'] += entry[1]
+            return entry[2]
+
+        start = time.perf_counter()
+        info = fetch(url)
+        entry = (now, time.perf_counter() - start, info)
+        with self.lock:
+            self._remember(key, entry)
+            self.stats['misses'] += 1
+        self._write_disk(key, entry)
+        return info
+
+    def _remember(self, key, entry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_items:
+            self.entries.popitem(last=False)
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, re.sub(r'[^0-9A-Za-z_-]', '_', key)[:100] + '.json')
+
+    def _read_disk(self, key, now):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if now - data['fetched_at'] > self.ttl:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return data['fetched_at'], data['fetch_seconds'], data['info']
+
+    def _write_disk(self, key, entry):
+        if not self.disk_dir:
+            return
+        fetched_at, fetch_seconds, info = entry
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'fetched_at': fetched_at, 'fetch_seconds': fetch_seconds, 'info': info}, f)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError):
+            # Info that cannot be written just stays memory-only
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+        self._prune_disk()
+
+    def _prune_disk(self):
+        """Remove the least recently written files beyond `disk_items` (runs only after a miss)"""
+        try:
+            files = [e for e in os.scandir(self.disk_dir) if e.name.endswith('.json')]
+            if len(files) <= self.disk_items:
+                return
+            files.sort(key=lambda e: e.stat().st_mtime)
+            for e in files[:len(files) - self.disk_items]:
+                os.remove(e.path)
+        except OSError:
+            pass
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            for name in self.stats:
+                self.stats[name] = 0
+        if self.disk_dir:
+            for name in os.listdir(self.disk_dir):
+                if name.endswith('.json'):
+                    try:
+                        os.remove(os.path.join(self.disk_dir, name))
+                    except OSError:
+                        pass
+
+    def info(self):
+        """Counters for display"""
+        with self.lock:
+            hits = self.stats['memory_hits'] + self.stats['disk_hits']
+            lookups = hits + self.stats['misses']
+            return {
+                **self.stats,
+                'hit_rate': hits / lookups if lookups else 0.0,
+                'entries': len(self.entries),
+            }